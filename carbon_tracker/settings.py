@@ -59,14 +59,20 @@ INSTALLED_APPS = [
 
     # Google provider
     'allauth.socialaccount.providers.google',
+    # GitHub provider (tokens for the commit connector)
+    'allauth.socialaccount.providers.github',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the whole stack (no-op unless METRICS_ENABLED)
+    'tracker.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Replica reads for @replica_reads views (no-op without a replica)
+    'tracker.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
@@ -126,11 +132,113 @@ DATABASES = {
             'connect_timeout': 10,
             'autocommit': True,
         },
+
+        # Persistent connections: reused for up to DB_CONN_MAX_AGE seconds so
+        # requests skip the TLS handshake; a connection that died while idle
+        # (e.g. dropped by Railway) is detected and replaced before reuse
+        'CONN_MAX_AGE': config("DB_CONN_MAX_AGE", default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Optional read replica for the read-heavy views (see tracker.db_router);
+# credentials default to the primary's
+if config("DB_REPLICA_HOST", default=""):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config("DB_REPLICA_NAME", default=DATABASES['default']['NAME']),
+        'USER': config("DB_REPLICA_USER", default=DATABASES['default']['USER']),
+        'PASSWORD': config("DB_REPLICA_PASSWORD", default=DATABASES['default']['PASSWORD']),
+        'HOST': config("DB_REPLICA_HOST"),
+        'PORT': config("DB_REPLICA_PORT", default=DATABASES['default']['PORT'], cast=int),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['tracker.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)  # primary-only reads after a session writes
+
+
+# Cache
+# locmem for development/tests; use "file" (or "db", after
+# `manage.py createcachetable`) in production so all workers share it.
+# "default" holds recomputable entries (dashboard numbers, snapshots and
+# their version stamps); "state" holds what can't be rebuilt (OTP codes and
+# attempt counters, chat memory), so churn in the first never evicts it.
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem" if DEBUG else "file")
+# Entries kept before the backend culls a third of them at random. About five
+# per active user in "default" (three dashboard periods, snapshot, version
+# stamp); in "state", two per pending password reset and one per chat session.
+CACHE_MAX_ENTRIES = config("CACHE_MAX_ENTRIES", default=50000, cast=int)
+STATE_CACHE_MAX_ENTRIES = config("STATE_CACHE_MAX_ENTRIES", default=20000, cast=int)
+_CACHE_BACKENDS = {
+    "locmem": (
+        "django.core.cache.backends.locmem.LocMemCache",
+        {"default": "dcf-tracker", "state": "dcf-tracker-state"},
+    ),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        {
+            # Separate directories: clearing one cache removes its whole directory
+            "default": config("CACHE_LOCATION", default=str(BASE_DIR / ".django_cache")),
+            "state": config("STATE_CACHE_LOCATION", default=str(BASE_DIR / ".django_cache_state")),
+        },
+    ),
+    "db": (
+        "django.core.cache.backends.db.DatabaseCache",
+        {"default": "django_cache", "state": "django_cache_state"},
+    ),
+}
+_CACHE_MAX_ENTRIES = {"default": CACHE_MAX_ENTRIES, "state": STATE_CACHE_MAX_ENTRIES}
+CACHES = {
+    alias: {
+        "BACKEND": _CACHE_BACKENDS[CACHE_BACKEND][0],
+        "LOCATION": _CACHE_BACKENDS[CACHE_BACKEND][1][alias],
+        "OPTIONS": {"MAX_ENTRIES": max_entries},
     }
+    for alias, max_entries in _CACHE_MAX_ENTRIES.items()
 }
 
-# Avoid dead connections on Railway
-CONN_MAX_AGE = 60    # reconnect every 60 seconds
+DASHBOARD_CACHE_TTL = config("DASHBOARD_CACHE_TTL", default=3600, cast=int)  # seconds
+# Per-user context (totals, rank, latest log) shared by the dashboard and EcoBot;
+# activity writes refresh it, the TTL bounds how stale other users' ranks get
+USER_SNAPSHOT_TTL = config("USER_SNAPSHOT_TTL", default=30, cast=int)  # seconds
+
+# Forgot-password OTPs (users.otp); the cache must be shared by all workers
+OTP_STORE_BACKEND = config("OTP_STORE_BACKEND", default="users.otp.CacheOTPStore")
+OTP_CACHE_ALIAS = config("OTP_CACHE_ALIAS", default="state")
+OTP_TTL = config("OTP_TTL", default=600, cast=int)  # seconds
+OTP_MAX_ATTEMPTS = config("OTP_MAX_ATTEMPTS", default=5, cast=int)  # wrong guesses before the code is burnt
+
+# How long each process keeps the emission-factor versions before re-reading
+EMISSION_FACTORS_TTL = config("EMISSION_FACTORS_TTL", default=60, cast=int)  # seconds
+
+# Request metrics at /metrics (tracker.metrics) and the slow-request log
+METRICS_ENABLED = config("METRICS_ENABLED", default=False, cast=bool)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")  # if set, scrapers send "Authorization: Bearer <token>"
+SLOW_REQUEST_MS = config("SLOW_REQUEST_MS", default=1000, cast=int)  # 0 turns the slow-request log off
+SLOW_REQUEST_SQL_LIMIT = config("SLOW_REQUEST_SQL_LIMIT", default=5, cast=int)  # statements logged per slow request
+
+# Background tasks (tracker.taskqueue, run by `manage.py run_worker`)
+TASKS_RUN_EAGERLY = config("TASKS_RUN_EAGERLY", default=False, cast=bool)  # run in-process after commit
+TASK_POLL_INTERVAL = config("TASK_POLL_INTERVAL", default=1.0, cast=float)  # seconds between empty polls
+TASK_RETRY_DELAY = config("TASK_RETRY_DELAY", default=30, cast=int)  # seconds, doubled per attempt
+TASK_TIMEOUT = config("TASK_TIMEOUT", default=600, cast=int)  # seconds before a running job is requeued
+
+# Gmail / Drive / GitHub sync (tracker.connectors, run by `manage.py sync_activity`)
+SYNC_MAX_WORKERS = config("SYNC_MAX_WORKERS", default=8, cast=int)  # concurrent API calls
+SYNC_BACKFILL_DAYS = config("SYNC_BACKFILL_DAYS", default=30, cast=int)  # days fetched on a user's first sync
+SYNC_MAX_RETRIES = config("SYNC_MAX_RETRIES", default=3, cast=int)  # per request, on 429/5xx/connection errors
+SYNC_TIMEOUT = config("SYNC_TIMEOUT", default=10.0, cast=float)  # seconds per request
+SYNC_RATE_LIMITS = {  # requests per second to each API, across all pool threads
+    "gmail": config("SYNC_GMAIL_RATE", default=20.0, cast=float),
+    "drive": config("SYNC_DRIVE_RATE", default=10.0, cast=float),
+    "github": config("SYNC_GITHUB_RATE", default=1.0, cast=float),
+}
+SYNC_BASE_URLS = {
+    "gmail": config("SYNC_GMAIL_URL", default="https://gmail.googleapis.com"),
+    "drive": config("SYNC_DRIVE_URL", default="https://www.googleapis.com"),
+    "github": config("SYNC_GITHUB_URL", default="https://api.github.com"),
+}
 
 
 
@@ -138,6 +246,8 @@ SOCIALACCOUNT_AUTO_SIGNUP = True
 SOCIALACCOUNT_EMAIL_REQUIRED = True
 SOCIALACCOUNT_EMAIL_VERIFICATION = "none"
 SOCIALACCOUNT_LOGIN_ON_GET = True
+# Keep OAuth tokens so tracker.connectors can call the Gmail/Drive/GitHub APIs
+SOCIALACCOUNT_STORE_TOKENS = True
 
 
 # Password validation
@@ -189,7 +299,7 @@ STATICFILES_DIRS = [
 ]
 
 # Ensure WhiteNoise is used for serving static files in production
-MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
+MIDDLEWARE.insert(2, "whitenoise.middleware.WhiteNoiseMiddleware")
 
 # Optional (recommended for production performance)
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -205,3 +315,23 @@ LOGIN_URL = '/users/login/'           # Redirects here when login is required
 SITE_ID = 1
 LOGIN_REDIRECT_URL = 'dashboard'  # Go to the dashboard page after login
 LOGOUT_REDIRECT_URL = 'home'      # Go to the homepage after logout
+
+
+# EcoBot (Gemini chatbot)
+# CHATBOT_BACKEND=stub swaps Gemini for a local fake model (load testing)
+CHATBOT_BACKEND = config("CHATBOT_BACKEND", default="gemini")
+GEMINI_MODEL = config("GEMINI_MODEL", default="gemini-2.5-flash")
+CHATBOT_TIMEOUT = config("CHATBOT_TIMEOUT", default=8.0, cast=float)        # seconds per reply
+CHATBOT_STREAM_TIMEOUT = config("CHATBOT_STREAM_TIMEOUT", default=20.0, cast=float)  # seconds per streamed reply
+CHATBOT_MAX_WORKERS = config("CHATBOT_MAX_WORKERS", default=4, cast=int)    # concurrent model calls
+CHATBOT_MAX_QUEUE = config("CHATBOT_MAX_QUEUE", default=8, cast=int)        # waiting calls before "busy"
+# Per process: keep CHATBOT_MAX_WORKERS + CHATBOT_MAX_QUEUE below gunicorn's WEB_THREADS (Procfile)
+CHATBOT_STUB_DELAY = config("CHATBOT_STUB_DELAY", default=0.5, cast=float)  # stub model latency
+CHATBOT_CACHE_SIZE = config("CHATBOT_CACHE_SIZE", default=512, cast=int)    # cached replies (LRU)
+CHATBOT_CACHE_TTL = config("CHATBOT_CACHE_TTL", default=600, cast=int)      # seconds
+# Conversation memory (tracker.conversation): recent turns verbatim, older ones summarised
+CHAT_MEMORY_TURNS = config("CHAT_MEMORY_TURNS", default=6, cast=int)                      # turns kept verbatim
+CHAT_MEMORY_MESSAGE_CHARS = config("CHAT_MEMORY_MESSAGE_CHARS", default=600, cast=int)    # per stored message
+CHAT_MEMORY_SUMMARY_CHARS = config("CHAT_MEMORY_SUMMARY_CHARS", default=1200, cast=int)  # summary of older turns
+CHAT_MEMORY_TTL = config("CHAT_MEMORY_TTL", default=86400, cast=int)                      # seconds since last message
+CHAT_MEMORY_CACHE_ALIAS = config("CHAT_MEMORY_CACHE_ALIAS", default="state")
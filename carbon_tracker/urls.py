@@ -16,13 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
-from tracker.views import chatbot
+from tracker.views import chatbot, chatbot_stats, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('tracker.urls')),  # Include URLs from the tracker app
     path('users/', include('users.urls')),
     path("chatbot/",chatbot, name="chatbot"),
+    path("chatbot/stats/", chatbot_stats, name="chatbot_stats"),
+    path("metrics", metrics_view, name="metrics"),
     
     path('accounts/', include('allauth.urls')),
 
@@ -0,0 +1,49 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import signals
+from .models import ActivityLog
+
+COUNT_FIELDS = ("emails_sent", "drive_storage_gb", "github_commits")
+
+
+def record_day(user_id, day, **counts):
+    """
+    Adds `counts` (emails_sent, drive_storage_gb, github_commits) to the
+    user's ActivityLog for `day`, creating the row if it's the first entry
+    that day, so a user has at most one row per day. Returns True if a new
+    row was created.
+    """
+    counts = {name: counts.get(name) or 0 for name in COUNT_FIELDS}
+    with transaction.atomic():
+        if _merge(user_id, day, counts):
+            return False
+        try:
+            with transaction.atomic():
+                # post_save applies the new row to the aggregates
+                ActivityLog.objects.create(user_id=user_id, date=day, **counts)
+            return True
+        except IntegrityError:
+            # Another request created the day's row first
+            _merge(user_id, day, counts)
+            return False
+
+
+def _merge(user_id, day, counts):
+    increments = {name: F(name) + value for name, value in counts.items()}
+    if not ActivityLog.objects.filter(user_id=user_id, date=day).update(**increments):
+        return False
+    # update() skips post_save; the receiver shifts the aggregates by the added counts
+    signals.activity_merged.send(sender=ActivityLog, delta=ActivityLog(user_id=user_id, date=day, **counts))
+    return True
+
+
+def reset_history(user):
+    """
+    Deletes every ActivityLog of a user. The per-row receivers are muted and
+    the derived tables are cleared once through the history_reset signal.
+    """
+    with transaction.atomic():
+        with signals.suspended():
+            ActivityLog.objects.filter(user=user).delete()
+        signals.history_reset.send(sender=ActivityLog, user=user)
@@ -1,6 +1,12 @@
 from django.contrib import admin
-from .models import ActivityLog, CarbonFootprint
+from .models import ActivityLog, CarbonFootprint, DailyFootprint, EmissionFactorVersion, Badge, UserBadge, Task, SyncCursor
 # Register your models here.
 
 admin.site.register(ActivityLog)
 admin.site.register(CarbonFootprint)
+admin.site.register(DailyFootprint)
+admin.site.register(EmissionFactorVersion)
+admin.site.register(Badge)
+admin.site.register(UserBadge)
+admin.site.register(Task)
+admin.site.register(SyncCursor)
@@ -0,0 +1,205 @@
+"""
+Rule-based badge awards.
+
+Each badge is a declarative Rule: a stable code, its display fields and a
+predicate over a user's Progress (streaks, runs of days under the daily CO₂
+goal, week-over-week reductions...), computed from the daily rollup.
+
+evaluate() checks many users at once and writes new awards with one
+bulk_create. ActivityLog signals call schedule(), which queues the check on
+the task queue, so logging activity never waits on badge checks; the
+`award_badges` command runs the same pass over everyone.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.utils import timezone
+
+from .models import Badge, UserBadge, UserProfile, DailyFootprint, DAILY_CO2_GOAL
+from .rollups import week_start
+from .taskqueue import task
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class Progress:
+    log_count: int = 0
+    total_co2: float = 0.0
+    best_streak: int = 0            # most consecutive days with a log
+    best_under_goal: int = 0        # most consecutive logged days under DAILY_CO2_GOAL
+    best_reductions: int = 0        # most consecutive weeks each lower than the one before
+
+
+@dataclass(frozen=True)
+class Rule:
+    code: str
+    name: str
+    description: str
+    icon: str
+    check: Callable[[Progress], bool]
+
+
+def logs_at_least(n):
+    return lambda p: p.log_count >= n
+
+
+def streak_of(days):
+    return lambda p: p.best_streak >= days
+
+
+def under_goal_for(days):
+    return lambda p: p.best_under_goal >= days
+
+
+def reductions_in_a_row(weeks):
+    return lambda p: p.best_reductions >= weeks
+
+
+RULES = [
+    Rule("first-log", "First Activity Logged", "Logged your first activity!", "🎉", logs_at_least(1)),
+    Rule("ten-logs", "Regular Logger", "Logged 10 activities.", "📝", logs_at_least(10)),
+    Rule("streak-7", "Week Streak", "Logged activity 7 days in a row.", "🔥", streak_of(7)),
+    Rule("streak-30", "Month Streak", "Logged activity 30 days in a row.", "📅", streak_of(30)),
+    Rule("under-goal-3", "Light Footprint", "Stayed under the daily CO₂ goal 3 days running.", "🌱", under_goal_for(3)),
+    Rule("under-goal-7", "Low-Carbon Week", "Stayed under the daily CO₂ goal 7 days running.", "🌿", under_goal_for(7)),
+    Rule("reduction-1", "Trending Down", "Cut your weekly CO₂ compared with the week before.", "📉", reductions_in_a_row(1)),
+    Rule("reduction-3", "Steady Decline", "Cut your weekly CO₂ three weeks in a row.", "🏅", reductions_in_a_row(3)),
+]
+
+
+# --- Badge catalogue ---
+
+def badge_ids():
+    """
+    {rule code: Badge id}, creating missing Badge rows. Read afresh on every
+    call (one small query), so rows deleted or recreated by an admin never
+    leave stale ids behind.
+    """
+    codes = [r.code for r in RULES]
+    ids = dict(Badge.objects.filter(code__in=codes).values_list("code", "id"))
+    if len(ids) < len(codes):
+        Badge.objects.bulk_create(
+            [
+                Badge(code=r.code, name=r.name, description=r.description, icon=r.icon)
+                for r in RULES if r.code not in ids
+            ],
+            ignore_conflicts=True,
+        )
+        ids = dict(Badge.objects.filter(code__in=codes).values_list("code", "id"))
+    return ids
+
+
+# --- Progress ---
+
+def _longest_streak(days, keep=None):
+    """Most consecutive calendar days in `days` whose co2 passes `keep`."""
+    best = run = 0
+    previous = None
+    for day, co2 in days:
+        if keep is not None and not keep(co2):
+            run = 0
+        elif run and day == previous + timedelta(days=1):
+            run += 1
+        else:
+            run = 1
+        previous = day
+        best = max(best, run)
+    return best
+
+
+def _longest_decline(days, today):
+    """Most consecutive completed weeks whose CO₂ fell below the week before."""
+    weeks = {}
+    for day, co2 in days:
+        start = week_start(day)
+        # The current week is still filling up and would always look like a drop
+        if start + timedelta(days=7) <= today:
+            weeks[start] = weeks.get(start, 0.0) + co2
+    starts = sorted(weeks)
+    best = run = 0
+    for before, start in zip(starts, starts[1:]):
+        if start - before == timedelta(days=7) and weeks[start] < weeks[before]:
+            run += 1
+        else:
+            run = 0
+        best = max(best, run)
+    return best
+
+
+def progress_for(days, log_count=0, total_co2=0.0, today=None):
+    """Progress from one user's (date, co2) daily rows, oldest first."""
+    return Progress(
+        log_count=log_count,
+        total_co2=total_co2,
+        best_streak=_longest_streak(days),
+        best_under_goal=_longest_streak(days, keep=lambda co2: co2 < DAILY_CO2_GOAL),
+        best_reductions=_longest_decline(days, today or timezone.now().date()),
+    )
+
+
+# --- Evaluation ---
+
+def evaluate(user_ids):
+    """
+    Checks every rule for `user_ids` and awards what they newly qualify
+    for. Users already holding every badge are skipped without reading
+    their history. Returns the number of badges awarded.
+    """
+    ids = badge_ids()   # once per pass
+    all_rules = {ids[r.code] for r in RULES if r.code in ids}
+    user_ids = sorted(set(user_ids))
+    awarded = 0
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[i:i + BATCH_SIZE]
+        held = {}
+        for user_id, badge_id in UserBadge.objects.filter(user_id__in=batch).values_list("user_id", "badge_id"):
+            held.setdefault(user_id, set()).add(badge_id)
+        pending = [u for u in batch if not all_rules <= held.get(u, set())]
+        if not pending:
+            continue
+
+        profiles = {
+            user_id: (log_count, total_co2)
+            for user_id, log_count, total_co2 in UserProfile.objects.filter(user_id__in=pending)
+            .values_list("user_id", "log_count", "total_co2")
+        }
+        history = {}
+        for user_id, day, co2 in (
+            DailyFootprint.objects.filter(user_id__in=pending)
+            .order_by("user_id", "date").values_list("user_id", "date", "co2")
+        ):
+            history.setdefault(user_id, []).append((day, co2))
+
+        awards = []
+        for user_id in pending:
+            progress = progress_for(history.get(user_id, []), *profiles.get(user_id, (0, 0.0)))
+            for rule in RULES:
+                badge_id = ids.get(rule.code)
+                if badge_id and badge_id not in held.get(user_id, ()) and rule.check(progress):
+                    awards.append(UserBadge(user_id=user_id, badge_id=badge_id))
+        # A concurrent pass may have awarded the same badge; the unique
+        # constraint makes that a no-op
+        UserBadge.objects.bulk_create(awards, ignore_conflicts=True)
+        awarded += len(awards)
+    return awarded
+
+
+def evaluate_all(batch_size=BATCH_SIZE):
+    """Batched pass over every user with a profile. Returns badges awarded."""
+    user_ids = list(UserProfile.objects.order_by("user_id").values_list("user_id", flat=True))
+    return sum(
+        evaluate(user_ids[i:i + batch_size])
+        for i in range(0, len(user_ids), batch_size)
+    )
+
+
+@task("tracker.award_badges")
+def award_badges(user_ids):
+    evaluate(user_ids)
+
+
+def schedule(user_ids):
+    """Queues a badge check for `user_ids` on the task queue."""
+    award_badges.enqueue(sorted(set(user_ids)))
@@ -0,0 +1,54 @@
+"""
+Synthetic activity data for benchmarks and query-plan checks.
+
+seed() writes N users x M days of ActivityLog with bulk inserts, then
+builds the rollups, leaderboard totals and badges the signals would have
+produced, so every view has realistic data to read. Callers normally run
+it inside a transaction they roll back.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import badges, leaderboard, rollups
+from .models import ActivityLog
+
+
+def seed(users, days, prefix="bench", rng_seed=0, batch_size=1000):
+    """Creates `users` users named "<prefix>-<i>" with `days` daily logs each. Returns the users."""
+    rng = random.Random(rng_seed)
+    today = timezone.now().date()
+
+    User.objects.bulk_create(
+        [User(username=f"{prefix}-{i}", password="!") for i in range(users)],
+        batch_size=batch_size,
+    )
+    # MySQL's bulk_create doesn't return primary keys
+    created = list(User.objects.filter(username__startswith=f"{prefix}-").order_by("id"))
+    user_ids = [u.id for u in created]
+
+    logs = []
+    for user_id in user_ids:
+        # Each user gets a typical level plus day-to-day noise and some gaps
+        emails, drive, commits = rng.randint(5, 120), rng.uniform(0.1, 3.0), rng.randint(0, 20)
+        for d in range(days):
+            if rng.random() < 0.1:
+                continue
+            logs.append(ActivityLog(
+                user_id=user_id,
+                date=today - timedelta(days=d),
+                emails_sent=max(0, int(rng.gauss(emails, emails / 4))),
+                drive_storage_gb=round(max(0.0, rng.gauss(drive, drive / 5)), 2),
+                github_commits=max(0, int(rng.gauss(commits, 3))),
+            ))
+        if len(logs) >= batch_size:
+            ActivityLog.objects.bulk_create(logs, batch_size=batch_size)
+            logs = []
+    ActivityLog.objects.bulk_create(logs, batch_size=batch_size)
+
+    rollups.rebuild(user_ids=user_ids, batch_size=batch_size)
+    leaderboard.recompute_profiles(user_ids)
+    badges.evaluate(user_ids)
+    return created
@@ -0,0 +1,114 @@
+"""
+Bounded thread pool for outbound LLM calls.
+
+At most CHATBOT_MAX_WORKERS generations run at once and at most
+CHATBOT_MAX_QUEUE more may wait for a slot; anything beyond that is rejected
+immediately with ChatBusy. Callers wait at most CHATBOT_TIMEOUT seconds and
+get ChatTimeout after that.
+
+The pool and its limits are per process, so they only protect the rest of
+the site when each process serves several requests at once: the Procfile
+runs gunicorn with gthread workers and WEB_THREADS (16) threads, more than
+the CHATBOT_MAX_WORKERS + CHATBOT_MAX_QUEUE (12) chat requests a process
+admits, so some threads are always left for other pages. Raise WEB_THREADS
+along with those two settings.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+
+class ChatBusy(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class ChatTimeout(Exception):
+    """The model didn't answer within CHATBOT_TIMEOUT (or finish streaming within CHATBOT_STREAM_TIMEOUT)."""
+
+
+_DONE = object()
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.CHATBOT_MAX_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ecobot")
+            _slots = threading.BoundedSemaphore(workers + settings.CHATBOT_MAX_QUEUE)
+    return _executor, _slots
+
+
+def _submit(executor, slots, fn, *args):
+    if not slots.acquire(blocking=False):
+        raise ChatBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is only freed once the call really finishes, even if the
+    # caller has already given up on it.
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def run(fn, *args, timeout=None):
+    """
+    Runs fn(*args) on the pool and returns its result.
+    Raises ChatBusy when the pool is saturated and ChatTimeout on timeout.
+    """
+    future = _submit(*_pool(), fn, *args)
+    try:
+        return future.result(timeout=timeout or settings.CHATBOT_TIMEOUT)
+    except FutureTimeout:
+        raise ChatTimeout()
+
+
+def stream(fn, *args, timeout=None, deadline=None):
+    """
+    Iterates fn(*args) on the pool and yields its items as they arrive.
+    `timeout` bounds the wait for each item (time to first token included)
+    and `deadline` the whole stream (CHATBOT_STREAM_TIMEOUT by default), so
+    a reply that keeps trickling in can't hold a request thread for long.
+    Closing the generator early tells the worker to stop pulling from fn.
+    """
+    timeout = timeout or settings.CHATBOT_TIMEOUT
+    ends = time.monotonic() + (deadline or settings.CHATBOT_STREAM_TIMEOUT)
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for item in fn(*args):
+                if stop.is_set():
+                    break
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    _submit(*_pool(), pump)
+    try:
+        while True:
+            wait = min(timeout, ends - time.monotonic())
+            try:
+                if wait <= 0:
+                    raise queue.Empty()
+                item = items.get(timeout=wait)
+            except queue.Empty:
+                raise ChatTimeout()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
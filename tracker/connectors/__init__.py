@@ -0,0 +1,9 @@
+"""
+Gmail, Drive and GitHub connectors that fill ActivityLog automatically.
+
+See tracker.connectors.sync for how a run is organised and
+tracker.connectors.fakes for local stand-ins of the three APIs.
+"""
+from .base import Account, Connector, Cursor, HttpClient, RateLimiter, SyncError  # noqa: F401
+from .sync import CONNECTORS, SyncReport, load_accounts, sync  # noqa: F401
+
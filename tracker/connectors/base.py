@@ -0,0 +1,128 @@
+"""
+HTTP plumbing shared by the connectors: a token-bucket rate limiter per API
+and a client that retries 429s, 5xx responses and connection errors with
+exponential backoff (honouring Retry-After). Each pool thread gets its own
+requests.Session, since sessions aren't safe to share between threads.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import requests
+from django.conf import settings
+
+
+class SyncError(Exception):
+    """A source couldn't be read for one user (bad token, retries exhausted...)."""
+
+
+@dataclass(frozen=True)
+class Account:
+    """One user's credentials for a source."""
+    user_id: int
+    token: str
+    login: str = ""          # GitHub username; unused by the Google APIs
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Where the last successful sync of a source stopped."""
+    last_synced: date = None
+    etag: str = ""
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url, limiter, max_retries=None, timeout=None, backoff=0.5):
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter
+        self.max_retries = settings.SYNC_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or settings.SYNC_TIMEOUT
+        self.backoff = backoff
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt
+
+    def get(self, path, token, params=None, headers=None):
+        """
+        GETs `path` (relative to base_url, or an absolute URL from a Link
+        header). Returns the response for 2xx and 304; raises SyncError otherwise.
+        """
+        url = path if path.startswith("http") else self.base_url + path
+        headers = {"Authorization": f"Bearer {token}", **(headers or {})}
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self._session().get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+                response = None
+            else:
+                if response.status_code < 400:
+                    return response
+                error = f"HTTP {response.status_code} from {url}"
+                if response.status_code not in self.RETRY_STATUSES:
+                    raise SyncError(error)
+            if attempt < self.max_retries:
+                time.sleep(self._delay(attempt, response))
+        raise SyncError(f"{error} (gave up after {self.max_retries + 1} attempts)")
+
+
+class Connector:
+    """
+    Reads one source's daily values for a user. Subclasses set the class
+    attributes and implement fetch(); they only make HTTP calls, so fetch()
+    is safe to run on pool threads.
+    """
+    source = None         # key in SYNC_BASE_URLS / SYNC_RATE_LIMITS and SyncCursor.source
+    field = None          # the ActivityLog field the values fill
+    provider = None       # allauth provider holding the OAuth token
+    profile_flag = None   # users.UserProfile flag that opts a user in
+
+    def __init__(self, client):
+        self.client = client
+
+    def start_day(self, cursor, today):
+        """First day to fetch: the last synced day again (it may have been partial) or the backfill window."""
+        if cursor.last_synced:
+            return min(cursor.last_synced, today)
+        return today.fromordinal(today.toordinal() - settings.SYNC_BACKFILL_DAYS + 1)
+
+    def fetch(self, account, cursor, today):
+        """Returns ({date: value}, new Cursor) for the days since `cursor`."""
+        raise NotImplementedError
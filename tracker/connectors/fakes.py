@@ -0,0 +1,174 @@
+"""
+Local stand-ins for the Gmail, Drive and GitHub APIs, so the connectors can
+be run end to end (`manage.py sync_activity --fake`) without network access
+or real OAuth tokens.
+
+FakeAPIServer serves the endpoints the connectors use from one
+ThreadingHTTPServer on a free localhost port. Figures are derived from the
+bearer token / login and the day, so repeated syncs see the same data; the
+GitHub feed honours If-None-Match, and `fail_every=N` answers every Nth
+request with a 429 to exercise the retry path.
+"""
+import hashlib
+import json
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.utils import timezone
+
+from .base import Account
+
+
+def _number(*parts, high):
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+    return int(digest[:8], 16) % high
+
+
+def accounts_for(user_ids, sources):
+    """Fake credentials for `user_ids`, in the shape sync(accounts=...) takes."""
+    return {
+        source: [Account(user_id, f"fake-token-{user_id}", f"fake-user-{user_id}") for user_id in user_ids]
+        for source in sources
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeAPI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        fake = self.server.fake
+        if fake.should_fail():
+            return self._send(429, {"error": "rate limited"}, {"Retry-After": "0"})
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return self._send(401, {"error": "unauthorized"})
+        token = auth[len("Bearer "):]
+
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/gmail/v1/users/me/messages":
+            return self._send(200, fake.gmail_messages(token, query))
+        if url.path == "/drive/v3/about":
+            return self._send(200, fake.drive_about(token))
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "users" and parts[2] == "events":
+            return self._github_events(fake, parts[1], query)
+        return self._send(404, {"error": "not found"})
+
+    def _github_events(self, fake, login, query):
+        etag = fake.github_etag(login)
+        if self.headers.get("If-None-Match") == etag:
+            fake.count("not_modified")
+            return self._send(304)
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        events = fake.github_events(login)
+        headers = {"ETag": etag}
+        if page * per_page < len(events):
+            headers["Link"] = f'<{fake.url}/users/{login}/events?per_page={per_page}&page={page + 1}>; rel="next"'
+        return self._send(200, events[(page - 1) * per_page:page * per_page], headers)
+
+
+class FakeAPIServer:
+    def __init__(self, fail_every=0, events_per_user=120, today=None):
+        self.fail_every = fail_every
+        self.events_per_user = events_per_user
+        self.today = today or timezone.localdate()
+        self.counts = {"requests": 0, "failed": 0, "not_modified": 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_urls(self):
+        """{source: url} for sync(base_urls=...)."""
+        return {"gmail": self.url, "drive": self.url, "github": self.url}
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def should_fail(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            failing = self.fail_every and self.counts["requests"] % self.fail_every == 0
+            if failing:
+                self.counts["failed"] += 1
+        return failing
+
+    # --- API payloads ---
+
+    def gmail_sent(self, token, day):
+        return _number(token, "gmail", day, high=120)
+
+    def gmail_messages(self, token, query):
+        after = query["q"].split("after:")[1].split()[0]
+        day = date(*(int(part) for part in after.split("/")))
+        total = self.gmail_sent(token, day)
+        page_size = int(query.get("maxResults", 100))
+        offset = int(query.get("pageToken", 0))
+        end = min(total, offset + page_size)
+        body = {"messages": [{"id": f"{day:%Y%m%d}-{i}"} for i in range(offset, end)]}
+        if end < total:
+            body["nextPageToken"] = str(end)
+        return body
+
+    def drive_bytes(self, token):
+        return _number(token, "drive", high=50) * 1024 ** 3 // 4
+
+    def drive_about(self, token):
+        return {"storageQuota": {"usageInDrive": str(self.drive_bytes(token))}}
+
+    def github_etag(self, login):
+        return f'W/"{_number(login, self.today, high=10 ** 9)}"'
+
+    def github_events(self, login):
+        events = []
+        for i in range(self.events_per_user):
+            day = self.today - timedelta(days=i // 3)
+            pushed = _number(login, "push", i, high=4)
+            events.append({
+                "id": str(i),
+                "type": "PushEvent" if pushed else "WatchEvent",
+                "created_at": f"{day.isoformat()}T12:00:00Z",
+                "payload": {"size": pushed, "distinct_size": pushed},
+            })
+        return events
@@ -0,0 +1,54 @@
+"""
+Gmail (emails sent per day) and Drive (storage in use) connectors.
+
+Both use the token of the user's Google login. Gmail is counted one day at a
+time from the day of the last sync; Drive storage is a level rather than a
+per-day count, so each sync records today's figure only.
+"""
+from datetime import timedelta
+
+from .base import Connector, Cursor
+
+GMAIL_PAGE_SIZE = 500
+BYTES_PER_GB = 1024 ** 3
+
+
+class GmailConnector(Connector):
+    source = "gmail"
+    field = "emails_sent"
+    provider = "google"
+    profile_flag = "gmail_connected"
+
+    def fetch(self, account, cursor, today):
+        counts = {}
+        day = self.start_day(cursor, today)
+        while day <= today:
+            counts[day] = self._sent_on(account, day)
+            day += timedelta(days=1)
+        return counts, Cursor(last_synced=today)
+
+    def _sent_on(self, account, day):
+        params = {
+            "q": f"in:sent after:{day:%Y/%m/%d} before:{day + timedelta(days=1):%Y/%m/%d}",
+            "maxResults": GMAIL_PAGE_SIZE,
+            "fields": "messages/id,nextPageToken",
+        }
+        total = 0
+        while True:
+            data = self.client.get("/gmail/v1/users/me/messages", account.token, params).json()
+            total += len(data.get("messages", []))
+            if not data.get("nextPageToken"):
+                return total
+            params["pageToken"] = data["nextPageToken"]
+
+
+class DriveConnector(Connector):
+    source = "drive"
+    field = "drive_storage_gb"
+    provider = "google"
+    profile_flag = "gmail_connected"
+
+    def fetch(self, account, cursor, today):
+        data = self.client.get("/drive/v3/about", account.token, {"fields": "storageQuota"}).json()
+        used = int(data.get("storageQuota", {}).get("usageInDrive") or 0)
+        return {today: round(used / BYTES_PER_GB, 3)}, Cursor(last_synced=today)
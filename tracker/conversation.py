@@ -0,0 +1,107 @@
+"""
+Per-session EcoBot conversation memory.
+
+Each logged-in browser session has one conversation, stored in the
+CHAT_MEMORY_CACHE_ALIAS cache ("state") under its session key (not in the
+session itself: streamed replies finish after the session middleware has
+saved); anonymous chats have none. The last CHAT_MEMORY_TURNS turns
+are kept verbatim, each message clipped to CHAT_MEMORY_MESSAGE_CHARS; older
+turns are folded into a running summary capped at CHAT_MEMORY_SUMMARY_CHARS,
+dropping its oldest lines first. The history added to a prompt is therefore
+bounded however long the conversation runs, so prompt size and model
+latency stay flat.
+
+Folding is extractive (the question and the first sentence of the answer),
+so it costs no extra model call on the request path.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+
+SUMMARY_QUESTION_CHARS = 120
+SUMMARY_ANSWER_CHARS = 160
+
+
+def _cache():
+    return caches[settings.CHAT_MEMORY_CACHE_ALIAS]
+
+
+def _clip(text, limit):
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _first_sentence(text):
+    match = re.match(r"(.+?[.!?])(\s|$)", text.strip(), re.S)
+    return match.group(1) if match else text
+
+
+class Conversation:
+    def __init__(self, session_key, summary="", turns=None):
+        self.session_key = session_key
+        self.summary = summary
+        self.turns = turns or []     # [question, reply] pairs, oldest first
+
+    @classmethod
+    def load(cls, session_key):
+        data = _cache().get(cls._key(session_key)) or {}
+        return cls(session_key, data.get("summary", ""), data.get("turns"))
+
+    @staticmethod
+    def _key(session_key):
+        return f"ecobot:conversation:{hashlib.sha256(session_key.encode()).hexdigest()}"
+
+    def save(self):
+        _cache().set(self._key(self.session_key), {"summary": self.summary, "turns": self.turns},
+                     settings.CHAT_MEMORY_TTL)
+
+    def clear(self):
+        self.summary, self.turns = "", []
+        _cache().delete(self._key(self.session_key))
+
+    def add(self, question, reply):
+        """Records a finished turn, folding the oldest ones into the summary, and saves."""
+        limit = settings.CHAT_MEMORY_MESSAGE_CHARS
+        self.turns.append([_clip(question, limit), _clip(reply, limit)])
+        while len(self.turns) > settings.CHAT_MEMORY_TURNS:
+            self._fold(*self.turns.pop(0))
+        self.save()
+
+    def _fold(self, question, reply):
+        line = (
+            f"- User asked: {_clip(question, SUMMARY_QUESTION_CHARS)} "
+            f"EcoBot: {_clip(_first_sentence(reply), SUMMARY_ANSWER_CHARS)}"
+        )
+        lines = (self.summary.splitlines() if self.summary else []) + [line]
+        while len(lines) > 1 and sum(len(l) + 1 for l in lines) > settings.CHAT_MEMORY_SUMMARY_CHARS:
+            lines.pop(0)
+        self.summary = "\n".join(lines)[-settings.CHAT_MEMORY_SUMMARY_CHARS:]
+
+    def history(self):
+        """The prompt section describing the conversation so far ("" when it's new)."""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation (summary):\n" + self.summary)
+        if self.turns:
+            parts.append("Most recent messages:\n" + "\n".join(
+                f"User: {question}\nEcoBot: {reply}" for question, reply in self.turns
+            ))
+        return "\n\n".join(parts)
+
+    def fingerprint(self):
+        """Short digest of history(), for keying cached replies ("" when it's new)."""
+        history = self.history()
+        return hashlib.sha1(history.encode()).hexdigest() if history else ""
+
+
+def for_request(request):
+    """
+    The conversation of a logged-in user's session, or None. Anonymous
+    chats get no memory: the chatbot endpoint is open to any POST, and
+    starting a session for each would write a session row per request.
+    """
+    if not request.user.is_authenticated or not request.session.session_key:
+        return None
+    return Conversation.load(request.session.session_key)
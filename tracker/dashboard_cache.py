@@ -0,0 +1,48 @@
+"""
+Per-user cache of the computed dashboard numbers.
+
+Entries are keyed by user, period and date, plus a per-user version stamp.
+Any ActivityLog change replaces the stamp (see tracker.signals), which makes
+all of that user's cached periods unreachable at once. Whatever backend
+CACHES["default"] points at is used (locmem in development, file/DB in
+production so every worker sees the same invalidations).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+
+def _version_key(user_id):
+    return f"dashboard:v:{user_id}"
+
+
+def version(user_id):
+    """Stamp that changes whenever the user's activity data changes."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # A missing stamp must never resurrect old entries, so start fresh
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _key(user_id, period, day):
+    return f"dashboard:{user_id}:{version(user_id)}:{period}:{day.isoformat()}"
+
+
+def get(user_id, period, day):
+    stats = cache.get(_key(user_id, period, day))
+    metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="miss" if stats is None else "hit")
+    return stats
+
+
+def set(user_id, period, day, stats):
+    cache.set(_key(user_id, period, day), stats, settings.DASHBOARD_CACHE_TTL)
+
+
+def invalidate(user_id):
+    cache.set(_version_key(user_id), time.time_ns(), None)
@@ -0,0 +1,114 @@
+"""
+Read-replica routing.
+
+When DATABASES has a "replica" alias (DB_REPLICA_HOST is set), views marked
+with @replica_reads (dashboard, leaderboard, badges, chatbot) send their
+reads of the tracker activity models (REPLICA_MODELS) there. Everything
+else stays on "default": sessions, auth and the DB cache table (whose
+version stamps must never be read stale), every other view, every write
+and all background work. Replication lag is hidden from the writer: ReplicaMiddleware pins
+a session that has just written to the primary for REPLICA_PIN_SECONDS, so
+users always see their own changes. Other users' changes may show up on the
+replica views a little late.
+
+Writers outside a session (the task worker, imports, connectors, the
+emission-factor recompute) pin nobody, so anything that fills a shared cache
+must not read the replica: a lagging read would be cached under the new
+version stamp and served long after the replica caught up. Wrap those reads
+in primary_reads() (the dashboard numbers and tracker.snapshot do).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = "replica"
+PIN_SESSION_KEY = "_db_primary_until"
+# "app_label.ModelName" of the models whose reads may lag
+REPLICA_MODELS = {
+    "tracker.ActivityLog",
+    "tracker.DailyFootprint",
+    "tracker.CarbonFootprint",
+    "tracker.UserProfile",
+    "tracker.UserBadge",
+}
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+_wrote = contextvars.ContextVar("wrote", default=False)
+
+
+def replica_reads(view_func):
+    """Marks a read-mostly view whose queries may be served by the replica."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        return view_func(*args, **kwargs)
+    wrapper.replica_reads = True
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """Sends every read inside the block to the primary."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured() and model._meta.label in REPLICA_MODELS:
+            return REPLICA
+        # Explicit, so rows fetched from the replica don't pull related
+        # lookups (or later saves) over to it
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return False if db == REPLICA else None
+
+
+class ReplicaMiddleware:
+    """Turns replica reads on for @replica_reads views unless the session is pinned."""
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrote = _wrote.set(False)
+        use_replica = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and hasattr(request, "session"):
+                request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+        finally:
+            _use_replica.reset(use_replica)
+            _wrote.reset(wrote)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(view_func, "replica_reads", False):
+            return None
+        session = getattr(request, "session", None)
+        if session is None or session.get(PIN_SESSION_KEY, 0) < time.time():
+            _use_replica.set(True)
+        return None
@@ -0,0 +1,168 @@
+"""
+Emission-factor registry.
+
+Factors are effective-dated: an EmissionFactorVersion applies to every
+activity on or after its effective_from date until the next version, and
+the CO2_* constants in tracker.models apply before the first one. The
+versions are kept in-process and reloaded when a version stamp in
+CACHES["default"] changes, which every edit does (see tracker.signals), so
+all workers price new writes with the new factors from their next call on.
+EMISSION_FACTORS_TTL bounds the reuse as well, for caches that aren't
+shared between processes.
+
+Every CO₂ figure in the app goes through compute_co2 (Python values, scalar
+or vectorised) or co2_expression (the same rule as an ORM expression).
+"""
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, When, F, FloatField, ExpressionWrapper
+
+from .models import EmissionFactorVersion, CO2_EMAIL, CO2_DRIVE, CO2_COMMIT
+from .providers import numpy
+
+
+@dataclass(frozen=True)
+class Factors:
+    email: float
+    drive: float
+    commit: float
+    effective_from: date = None
+
+
+BASELINE = Factors(CO2_EMAIL, CO2_DRIVE, CO2_COMMIT)
+
+_VERSION_KEY = "emissions:factors:v"
+
+_lock = threading.Lock()
+_loaded_at = None
+_loaded_version = None
+_versions = []
+_starts = []
+
+
+def _shared_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def _table():
+    global _loaded_at, _loaded_version, _versions, _starts
+    version = _shared_version()
+    with _lock:
+        if (
+            _loaded_at is None
+            or version != _loaded_version
+            or time.monotonic() - _loaded_at > settings.EMISSION_FACTORS_TTL
+        ):
+            _versions = [
+                Factors(v.co2_per_email, v.co2_per_gb, v.co2_per_commit, v.effective_from)
+                for v in EmissionFactorVersion.objects.order_by("effective_from")
+            ]
+            _starts = [v.effective_from for v in _versions]
+            _loaded_at = time.monotonic()
+            _loaded_version = version
+        return _versions, _starts
+
+
+def versions():
+    """Effective-dated Factors, oldest first (BASELINE not included)."""
+    return _table()[0]
+
+
+def invalidate():
+    """Makes every process reload the versions on its next lookup."""
+    global _loaded_at
+    cache.set(_VERSION_KEY, time.time_ns(), None)
+    with _lock:
+        _loaded_at = None
+
+
+def _as_date(day):
+    return day.date() if isinstance(day, datetime) else day
+
+
+def factors_for(day):
+    """Factors in force on `day` (BASELINE when day is None or predates all versions)."""
+    table, starts = _table()
+    if day is None or not table:
+        return BASELINE
+    i = bisect.bisect_right(starts, _as_date(day)) - 1
+    return table[i] if i >= 0 else BASELINE
+
+
+def compute_co2(emails, drive, commits, dates=None, components=False):
+    """
+    CO₂ in kg for scalar counts on one date, or for equal-length sequences
+    of counts and dates (vectorised with NumPy, one factor lookup per row).
+    With components=True returns (emails_kg, drive_kg, github_kg) instead
+    of the total.
+    """
+    if not hasattr(emails, "__len__"):
+        f = factors_for(dates)
+        parts = (emails * f.email, drive * f.drive, commits * f.commit)
+        return parts if components else parts[0] + parts[1] + parts[2]
+
+    np = numpy.get()
+    table, starts = _table()
+    table = [BASELINE] + table
+    if dates is None or len(table) == 1:
+        idx = np.zeros(len(emails), dtype=int)
+    else:
+        starts = np.array([s.toordinal() for s in starts])
+        ordinals = np.array([_as_date(d).toordinal() for d in dates])
+        idx = np.searchsorted(starts, ordinals, side="right")
+
+    email_f = np.array([f.email for f in table])[idx]
+    drive_f = np.array([f.drive for f in table])[idx]
+    commit_f = np.array([f.commit for f in table])[idx]
+    parts = (
+        np.asarray(emails, dtype=float) * email_f,
+        np.asarray(drive, dtype=float) * drive_f,
+        np.asarray(commits, dtype=float) * commit_f,
+    )
+    return parts if components else parts[0] + parts[1] + parts[2]
+
+
+_COMPONENTS = {
+    "emails": ("emails_sent", "email"),
+    "drive": ("drive_storage_gb", "drive"),
+    "github": ("github_commits", "commit"),
+}
+
+
+def co2_expression(component=None, date_field="date"):
+    """
+    ORM expression for the CO₂ (kg) of a row with ActivityLog-style count
+    columns, picking the factor version by `date_field`. `component` limits
+    it to "emails", "drive" or "github".
+    """
+    names = [component] if component else list(_COMPONENTS)
+
+    def for_factors(f):
+        expr = None
+        for name in names:
+            column, attr = _COMPONENTS[name]
+            term = F(column) * getattr(f, attr)
+            expr = term if expr is None else expr + term
+        return ExpressionWrapper(expr, output_field=FloatField())
+
+    table = versions()
+    if not table:
+        return for_factors(BASELINE)
+    return Case(
+        *[
+            When(**{f"{date_field}__gte": v.effective_from}, then=for_factors(v))
+            for v in reversed(table)
+        ],
+        default=for_factors(BASELINE),
+        output_field=FloatField(),
+    )
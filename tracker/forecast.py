@@ -0,0 +1,98 @@
+"""
+Closed-form least-squares forecasting for the cumulative CO₂ series.
+
+Replaces fitting a scikit-learn LinearRegression on every dashboard view:
+the slope and intercept come straight from the running sums
+(n, Σx, Σy, Σx², Σxy), which also lets forecast_many() fit every user's
+line at once with a handful of vectorised NumPy calls.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from .providers import numpy
+
+MIN_POINTS = 3          # same threshold the dashboard always used
+HORIZON = 7             # predict 7 steps past the end of the series
+Z_95 = 1.96             # normal quantile for a 95% prediction interval
+
+
+@dataclass
+class Forecast:
+    value: float
+    lower: float
+    upper: float
+
+
+def _fit(n, sx, sy, sxx, sxy):
+    """Slope and intercept of the least-squares line from its running sums."""
+    sxx_c = sxx - sx * sx / n
+    slope = (sxy - sx * sy / n) / sxx_c
+    intercept = (sy - slope * sx) / n
+    return slope, intercept, sxx_c
+
+
+def linear_forecast(values, horizon=HORIZON, dates=None, z=Z_95):
+    """
+    Fits y = a + b·i over i = 0..n-1 and evaluates it at i = n + horizon,
+    exactly like LinearRegression().fit(arange(n), values).predict(n + horizon).
+
+    `dates` (the date of each point; the series may skip days) adds a weekly
+    seasonal term: the mean residual of the target's weekday, the day
+    horizon + 1 days after the last point, is added to the trend. Returns a
+    Forecast with a z-based prediction interval, or None for short series.
+    """
+    np = numpy.get()
+    y = np.asarray(values, dtype=float)
+    n = y.size
+    if n < MIN_POINTS:
+        return None
+
+    x = np.arange(n, dtype=float)
+    slope, intercept, sxx_c = _fit(n, x.sum(), y.sum(), x @ x, x @ y)
+    target = n + horizon
+    value = intercept + slope * target
+
+    residuals = y - (intercept + slope * x)
+    if dates is not None:
+        weekdays = np.array([day.weekday() for day in dates], dtype=int)
+        counts = np.bincount(weekdays, minlength=7)
+        seasonal = np.bincount(weekdays, weights=residuals, minlength=7) / np.maximum(counts, 1)
+        value += seasonal[(dates[-1] + timedelta(days=horizon + 1)).weekday()]
+        residuals = residuals - seasonal[weekdays]
+
+    dof = max(n - 2, 1)
+    s = np.sqrt(residuals @ residuals / dof)
+    x_mean = x.mean()
+    margin = z * s * np.sqrt(1 + 1 / n + (target - x_mean) ** 2 / sxx_c)
+    return Forecast(float(value), float(value - margin), float(value + margin))
+
+
+def forecast_many(series, horizon=HORIZON):
+    """
+    Batch version of linear_forecast for many (ragged) series at once, e.g.
+    every user's cumulative CO₂. Returns a float array with one forecast per
+    series (NaN where there are fewer than MIN_POINTS values).
+    """
+    np = numpy.get()
+    lengths = np.array([len(s) for s in series], dtype=int)
+    result = np.full(len(series), np.nan)
+    if not lengths.sum():
+        return result
+
+    y = np.concatenate([np.asarray(s, dtype=float) for s in series])
+    group = np.repeat(np.arange(len(series)), lengths)
+    # Position of each value inside its own series
+    starts = np.cumsum(lengths) - lengths
+    x = np.arange(y.size) - np.repeat(starts, lengths)
+
+    k = len(series)
+    n = lengths.astype(float)
+    sx = np.bincount(group, weights=x, minlength=k)
+    sy = np.bincount(group, weights=y, minlength=k)
+    sxx = np.bincount(group, weights=x * x, minlength=k)
+    sxy = np.bincount(group, weights=x * y, minlength=k)
+
+    ok = lengths >= MIN_POINTS
+    slope, intercept, _ = _fit(n[ok], sx[ok], sy[ok], sxx[ok], sxy[ok])
+    result[ok] = intercept + slope * (n[ok] + horizon)
+    return result
@@ -1,79 +1,271 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
-from django.db.models import Sum, F, ExpressionWrapper, FloatField
-from tracker.models import UserProfile, ActivityLog
-import os
+from django.conf import settings
+from tracker import chat_pool, metrics, snapshot
+from tracker.providers import chat_model
+import re
+import threading
+import time
+from cachetools import TTLCache
+
+EMPTY_REPLY = "Sorry, I didn’t catch that."
+BUSY_REPLY = "🌱 EcoBot is helping a lot of people right now. Please try again in a moment."
+TIMEOUT_REPLY = "⏳ EcoBot is taking too long to answer. Please try again shortly."
+
+
+class StubModel:
+    """
+    Drop-in stand-in for GenerativeModel used for load testing
+    (CHATBOT_BACKEND=stub). Sleeps CHATBOT_STUB_DELAY seconds, then echoes.
+    """
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    REPLY = "EcoBot (stub): thanks for your question! Try cleaning up old cloud files."
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return self._stream()
+        time.sleep(settings.CHATBOT_STUB_DELAY)
+        return self.Response(self.REPLY)
+
+    def _stream(self):
+        words = self.REPLY.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(settings.CHATBOT_STUB_DELAY / len(words))
+            yield self.Response(word if i == 0 else " " + word)
+
 
 # --- Gemini API Setup ---
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.5-flash")
+# The model (and the google.generativeai import) is built on first use by
+# tracker.providers.chat_model, not at import time.
+
+
+# --- Response cache ---
+# Keyed on the normalised message plus fingerprints of the user context and
+# of the conversation so far. Anonymous answers to opening questions have
+# neither, so they are shared by everyone. The context comes from the user's
+# snapshot, which every activity write replaces in all processes (see
+# tracker.snapshot), so a write moves the user to new keys by itself.
+_cache = TTLCache(maxsize=settings.CHATBOT_CACHE_SIZE, ttl=settings.CHATBOT_CACHE_TTL)
+_cache_lock = threading.Lock()
+# Misses include busy/timeout/error fallbacks; model_calls counts only the
+# lookups the model actually answered, which model_seconds is summed over
+_stats = {"hits": 0, "misses": 0, "model_calls": 0, "model_seconds": 0.0}
+
+
+def normalize_message(message):
+    return re.sub(r"\s+", " ", message).strip().lower().rstrip("?!. ")
+
+
+def cache_stats():
+    """Hit/miss counters plus the model time the hits avoided (estimated)."""
+    with _cache_lock:
+        stats = dict(_stats)
+        stats["size"] = len(_cache)
+    lookups = stats["hits"] + stats["misses"]
+    avg = stats["model_seconds"] / stats["model_calls"] if stats["model_calls"] else 0.0
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["model_calls_saved"] = stats["hits"]
+    stats["seconds_saved"] = round(stats["hits"] * avg, 3)
+    return stats
 
 
-def ask_gemini(user, user_message: str):
+def _cache_key(user, user_message, context, conversation=None):
+    history = conversation.fingerprint() if conversation else ""
+    if context is None:
+        return (normalize_message(user_message), history)
+    return (normalize_message(user_message), history, user.id, tuple(context.values()))
+
+
+def ask_gemini(user, user_message: str, conversation=None):
     """
-    Sends the user query and personalized DCF Tracker context to Gemini.
-    Returns Gemini's text response.
+    Sends the user query and personalized DCF Tracker context to Gemini,
+    along with the bounded history of `conversation` (a
+    tracker.conversation.Conversation), which records the new turn.
+    Returns Gemini's text response, or a short fallback reply when the
+    model is saturated or doesn't answer within CHATBOT_TIMEOUT.
     """
+    context = user_context(user)
+    key = _cache_key(user, user_message, context, conversation)
+    with _cache_lock:
+        reply = _cache.get(key)
+        if reply is not None:
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    metrics.CACHE_LOOKUPS.inc(cache="chatbot", result="miss" if reply is None else "hit")
+    if reply is not None:
+        _remember(conversation, user_message, reply)
+        return reply
 
-    # ---- 1. Handle Unauthenticated Users ----
+    prompt = build_prompt(user, user_message, context, conversation.history() if conversation else "")
+    metrics.GEMINI_PROMPT_CHARS.observe(len(prompt))
+    started = time.monotonic()
+    try:
+        reply = chat_pool.run(generate, prompt)
+    except chat_pool.ChatBusy:
+        metrics.GEMINI_FAILURES.inc(reason="busy")
+        return BUSY_REPLY
+    except chat_pool.ChatTimeout:
+        metrics.GEMINI_FAILURES.inc(reason="timeout")
+        return TIMEOUT_REPLY
+    except Exception as e:
+        metrics.GEMINI_FAILURES.inc(reason="error")
+        return f"⚠️ Gemini Error: {e}"
+
+    with _cache_lock:
+        _stats["model_calls"] += 1
+        _stats["model_seconds"] += time.monotonic() - started
+        if reply != EMPTY_REPLY:
+            _cache[key] = reply
+    if reply != EMPTY_REPLY:
+        _remember(conversation, user_message, reply)
+    return reply
+
+
+def _remember(conversation, user_message, reply):
+    # Only real answers are remembered; fallbacks would just confuse the model
+    if conversation is not None:
+        conversation.add(user_message, reply)
+
+
+def generate(prompt):
+    """Blocking model call; runs on the chat_pool threads."""
+    started = time.perf_counter()
+    response = chat_model.get().generate_content(prompt)
+    metrics.GEMINI_SECONDS.observe(time.perf_counter() - started, mode="reply")
+    return response.text.strip() if response.text else EMPTY_REPLY
+
+
+def stream_gemini(user, user_message: str, conversation=None):
+    """
+    Streaming variant of ask_gemini: yields the reply in pieces as Gemini
+    produces them. Cached replies and fallbacks are yielded as one piece.
+    """
+    context = user_context(user)
+    key = _cache_key(user, user_message, context, conversation)
+    with _cache_lock:
+        reply = _cache.get(key)
+        if reply is not None:
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    metrics.CACHE_LOOKUPS.inc(cache="chatbot", result="miss" if reply is None else "hit")
+    if reply is not None:
+        _remember(conversation, user_message, reply)
+        yield reply
+        return
+
+    prompt = build_prompt(user, user_message, context, conversation.history() if conversation else "")
+    metrics.GEMINI_PROMPT_CHARS.observe(len(prompt))
+    started = time.monotonic()
+    pieces = []
+    try:
+        for piece in chat_pool.stream(generate_stream, prompt):
+            pieces.append(piece)
+            yield piece
+    except chat_pool.ChatBusy:
+        metrics.GEMINI_FAILURES.inc(reason="busy")
+        yield BUSY_REPLY
+        return
+    except chat_pool.ChatTimeout:
+        metrics.GEMINI_FAILURES.inc(reason="timeout")
+        yield TIMEOUT_REPLY if not pieces else " …"
+        return
+    except Exception as e:
+        metrics.GEMINI_FAILURES.inc(reason="error")
+        yield f"⚠️ Gemini Error: {e}"
+        return
+
+    reply = "".join(pieces).strip()
+    with _cache_lock:
+        _stats["model_calls"] += 1
+        _stats["model_seconds"] += time.monotonic() - started
+        if reply:
+            _cache[key] = reply
+    if not reply:
+        yield EMPTY_REPLY
+        return
+    _remember(conversation, user_message, reply)
+
+
+def generate_stream(prompt):
+    """Streaming model call; iterated on the chat_pool threads."""
+    started = time.perf_counter()
+    for chunk in chat_model.get().generate_content(prompt, stream=True):
+        if chunk.text:
+            yield chunk.text
+    metrics.GEMINI_SECONDS.observe(time.perf_counter() - started, mode="stream")
+
+
+def user_context(user):
+    """
+    Collects the per-user facts that go into the prompt (None when logged out).
+    They come from the cached snapshot shared with the dashboard, read on the
+    request thread, so the pool threads never hold database connections.
+    """
     if not user or not user.is_authenticated:
-        prompt = f"""
+        return None
+
+    context = snapshot.get(user.id)
+    if not context.has_profile:
+        latest_data = "No profile or activity data found."
+    elif context.latest_date:
+        latest_data = (
+            f"Last logged on {context.latest_date}: "
+            f"{context.latest_emails} emails, "
+            f"{context.latest_drive_gb} GB drive storage, "
+            f"{context.latest_commits} commits."
+        )
+    else:
+        latest_data = "No activity logs found."
+
+    return {
+        "total_co2": round(context.total_co2, 2),
+        "week_co2": round(context.week_co2, 2),
+        "rank": context.rank or "N/A",
+        "total_users": context.total_users,
+        "latest_data": latest_data,
+    }
+
+
+def build_prompt(user, user_message, context, history=""):
+    """
+    Turns the message, user_context() output and conversation history
+    (Conversation.history(), already bounded) into the Gemini prompt.
+    """
+    history = f"\n{history}\n" if history else ""
+
+    # ---- 1. Handle Unauthenticated Users ----
+    if context is None:
+        return f"""
         You are EcoBot, an AI assistant in the DCF Tracker web app.
         The user is not logged in.
-
+        {history}
         User asked: "{user_message}"
 
         Please answer generally about carbon footprint tracking, CO₂ reduction,
         and environmental sustainability.
         """
-        response = model.generate_content(prompt)
-        return response.text.strip() if response.text else "Sorry, I didn’t catch that."
-
-    # ---- 2. Get user-specific data ----
-    try:
-        profile = UserProfile.objects.get(user=user)
-        total_users = UserProfile.objects.count()
-        rank = list(UserProfile.objects.order_by("total_co2")).index(profile) + 1
-
-        latest_log = ActivityLog.objects.filter(user=user).order_by("-date").first()
-        if latest_log:
-            latest_data = (
-                f"Last logged on {latest_log.date}: "
-                f"{latest_log.emails_sent} emails, "
-                f"{latest_log.drive_storage_gb} GB drive storage, "
-                f"{latest_log.github_commits} commits."
-            )
-        else:
-            latest_data = "No activity logs found."
 
-    except UserProfile.DoesNotExist:
-        profile = None
-        rank = "N/A"
-        latest_data = "No profile or activity data found."
-
-    # ---- 3. Build Contextual Prompt ----
-    prompt = f"""
+    # ---- 2. Build Contextual Prompt ----
+    return f"""
     You are EcoBot, the intelligent AI assistant built into the DCF Tracker web app.
     The app helps users monitor and reduce their digital CO₂ footprint.
 
     User context:
     - Username: {user.username}
-    - Total CO₂ Emission: {profile.total_co2 if profile else 0:.2f} kg
-    - Rank: {rank} out of {total_users}
-    - Latest activity: {latest_data}
-
+    - Total CO₂ Emission: {context["total_co2"]:.2f} kg
+    - CO₂ this week: {context["week_co2"]:.2f} kg
+    - Rank: {context["rank"]} out of {context["total_users"]}
+    - Latest activity: {context["latest_data"]}
+    {history}
     The user asked: "{user_message}"
 
     Instructions for your answer:
     - If the question is about emissions, ranking, or suggestions, use the data above.
     - If it’s about general sustainability or CO₂, explain normally.
+    - If it follows up on the conversation above, answer in that context.
     - Keep answers friendly, short, and conversational.
     """
-
-    # ---- 4. Generate response from Gemini ----
-    try:
-        response = model.generate_content(prompt)
-        return response.text.strip() if response.text else "Sorry, I didn’t catch that."
-    except Exception as e:
-        return f"⚠️ Gemini Error: {e}"
@@ -0,0 +1,90 @@
+"""
+Keyset-paginated activity history, served as JSON by /api/activity/.
+
+Pages are ordered newest first by (date, id) and continue from an opaque
+cursor holding the last row's (date, id), so each page is one index range
+read of `limit` rows no matter how deep into the history it is (no OFFSET).
+Clients may ask for a subset of FIELDS; co2 is priced with the same
+effective-dated factors as the dashboard.
+"""
+import base64
+from datetime import date
+
+from django.db.models import Q
+
+from .emissions import compute_co2
+
+FIELDS = ["id", "date", "emails_sent", "drive_storage_gb", "github_commits", "co2"]
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+_COLUMNS = ["id", "date", "emails_sent", "drive_storage_gb", "github_commits"]
+
+
+def encode_cursor(day, pk):
+    return base64.urlsafe_b64encode(f"{day.isoformat()}|{pk}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(date, id) from a cursor; ValueError if it wasn't produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, pk = raw.split("|")
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(value):
+    """Requested field list from a comma-separated string (all FIELDS when empty)."""
+    if not value:
+        return list(FIELDS)
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = sorted(set(fields) - set(FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def page(queryset, after=None, limit=DEFAULT_LIMIT, fields=FIELDS):
+    """
+    One page of `queryset` (ActivityLog rows) after the cursor position
+    `after` = (date, id). Returns {"results": [...], "next": cursor or None}.
+    """
+    logs = queryset.order_by("-date", "-id")
+    if after:
+        day, pk = after
+        logs = logs.filter(Q(date__lt=day) | Q(date=day, id__lt=pk))
+    # One extra row tells us whether another page exists
+    rows = list(logs.values_list(*_COLUMNS)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    records = [dict(zip(_COLUMNS, row)) for row in rows]
+    if "co2" in fields and records:
+        co2 = compute_co2(
+            [r["emails_sent"] for r in records],
+            [r["drive_storage_gb"] for r in records],
+            [r["github_commits"] for r in records],
+            [r["date"] for r in records],
+        )
+        for record, value in zip(records, co2):
+            record["co2"] = round(float(value), 6)
+
+    results = []
+    for record in records:
+        record["date"] = record["date"].isoformat()
+        results.append({field: record[field] for field in fields})
+    return {
+        "results": results,
+        "next": encode_cursor(rows[-1][1], rows[-1][0]) if more else None,
+    }
@@ -0,0 +1,238 @@
+"""
+Bulk import of historical ActivityLog rows (CSV or JSON).
+
+Each row needs a `username` (or `user_id`), a `date` (YYYY-MM-DD) and the
+ActivityLogForm fields: emails_sent, drive_storage_gb, github_commits.
+Rows are validated with the same form the web UI uses and written in
+batches (one transaction each): rows for the same user-day are summed, and
+added to that day's existing ActivityLog if there is one, like repeated
+entries in the web UI. The derived tables are refreshed once per batch for
+the users it touched.
+"""
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+
+from django import forms
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from . import activity, signals
+from .forms import ActivityLogForm
+from .models import ActivityLog
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class IngestResult:
+    rows: int = 0
+    created: int = 0    # new user-days
+    updated: int = 0    # existing user-days the rows were added to
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "errors": self.errors[:100],
+            "error_count": len(self.errors),
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": self.rows_per_sec,
+        }
+
+
+def read_rows(stream, fmt):
+    """
+    Yields row dicts from a text or binary file object (csv / json / ndjson).
+    Input that isn't made of rows (bad CSV quoting, JSON that isn't a list
+    of objects) raises ValueError.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    if fmt == "csv":
+        try:
+            yield from csv.DictReader(stream)
+        except csv.Error as e:
+            raise ValueError(f"Malformed CSV: {e}")
+    elif fmt == "ndjson":
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                yield _as_row(json.loads(line), number)
+    elif fmt == "json":
+        rows = json.load(stream)
+        if not isinstance(rows, list):
+            raise ValueError("JSON input must be a list of objects")
+        for number, row in enumerate(rows, 1):
+            yield _as_row(row, number)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _as_row(value, number):
+    if not isinstance(value, dict):
+        raise ValueError(f"Row {number} is not an object")
+    return value
+
+
+def guess_format(filename):
+    name = (filename or "").lower()
+    for fmt in ("ndjson", "json", "csv"):
+        if name.endswith("." + fmt):
+            return fmt
+    return "csv"
+
+
+class _UserLookup:
+    """Resolves usernames / user ids to existing ids with one query per batch."""
+
+    def __init__(self):
+        self._by_name = {}
+        self._known_ids = set()
+
+    def prefetch(self, rows):
+        names = {str(r["username"]) for r in rows if r.get("username")} - self._by_name.keys()
+        ids = {_as_int(r.get("user_id")) for r in rows} - self._known_ids - {None}
+        if names:
+            self._by_name.update(User.objects.filter(username__in=names).values_list("username", "id"))
+        if ids:
+            self._known_ids.update(User.objects.filter(id__in=ids).values_list("id", flat=True))
+
+    def resolve(self, row):
+        user_id = _as_int(row.get("user_id"))
+        if user_id is not None:
+            return user_id if user_id in self._known_ids else None
+        return self._by_name.get(str(row.get("username")))
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ActivityLogForm's own field validators, reused per row: building a whole
+# ModelForm for every imported row costs more than the insert itself.
+_FORM_FIELDS = ActivityLogForm.base_fields
+_DATE_FIELD = forms.DateField()
+
+
+def _validate(row, lookup):
+    """Returns (ActivityLog, None) or (None, error message)."""
+    values = {}
+    errors = []
+    for name, form_field in _FORM_FIELDS.items():
+        try:
+            values[name] = form_field.clean(row.get(name))
+        except forms.ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    try:
+        values["date"] = _DATE_FIELD.clean(row.get("date"))
+    except forms.ValidationError as e:
+        errors.append(f"date: {' '.join(e.messages)}")
+    if errors:
+        return None, "; ".join(errors)
+
+    user_id = lookup.resolve(row)
+    if user_id is None:
+        return None, f"unknown user: {row.get('username') or row.get('user_id')!r}"
+    return ActivityLog(user_id=user_id, **values), None
+
+
+def import_rows(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Validates and writes `rows` (an iterable of dicts). Returns IngestResult."""
+    result = IngestResult()
+    started = time.perf_counter()
+    lookup = _UserLookup()
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _import_batch(batch, lookup, result)
+            batch = []
+    if batch:
+        _import_batch(batch, lookup, result)
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _import_batch(rows, lookup, result):
+    lookup.prefetch(rows)
+    days = {}
+    for row in rows:
+        result.rows += 1
+        log, error = _validate(row, lookup)
+        if error:
+            result.errors.append({"row": result.rows, "error": error})
+            continue
+        counts = days.setdefault((log.user_id, log.date), dict.fromkeys(activity.COUNT_FIELDS, 0))
+        for name in activity.COUNT_FIELDS:
+            counts[name] += getattr(log, name)
+    created, updated = upsert_days(days, accumulate=True)
+    result.created += created
+    result.updated += updated
+
+
+def upsert_days(values, accumulate=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes per-day values, `{(user_id, date): {field: value}}`, onto the
+    users' ActivityLog rows: the values replace the day's counts, or are
+    added to them with accumulate=True. Missing days get a new row, except
+    for all-zero replacements (synced days with no activity), which would
+    only inflate log counts. Returns (created, updated).
+    """
+    if not values:
+        return 0, 0
+    try:
+        return _upsert_days(values, accumulate, batch_size)
+    except IntegrityError:
+        # A concurrent write created one of the missing days; re-read and merge
+        return _upsert_days(values, accumulate, batch_size)
+
+
+def _upsert_days(values, accumulate, batch_size):
+    user_ids = {user_id for user_id, _ in values}
+    days = [day for _, day in values]
+    existing = {
+        (log.user_id, log.date): log
+        for log in ActivityLog.objects.filter(
+            user_id__in=user_ids, date__gte=min(days), date__lte=max(days),
+        ).iterator(chunk_size=batch_size)
+    }
+
+    to_create, to_update = [], []
+    for (user_id, day), fields in values.items():
+        log = existing.get((user_id, day))
+        if log is None:
+            if accumulate or any(fields.values()):
+                to_create.append(ActivityLog(user_id=user_id, date=day, **fields))
+            continue
+        changed = False
+        for name, value in fields.items():
+            if accumulate:
+                value += getattr(log, name)
+            if getattr(log, name) != value:
+                setattr(log, name, value)
+                changed = True
+        if changed:
+            to_update.append(log)
+
+    with transaction.atomic():
+        if to_update:
+            ActivityLog.objects.bulk_update(to_update, list(activity.COUNT_FIELDS), batch_size=batch_size)
+            signals.bulk_updated.send(sender=ActivityLog, user_ids={log.user_id for log in to_update})
+        if to_create:
+            ActivityLog.objects.bulk_create(to_create, batch_size=batch_size)
+            signals.bulk_created.send(sender=ActivityLog, logs=to_create)
+    return len(to_create), len(to_update)
@@ -0,0 +1,166 @@
+from datetime import timedelta
+
+from django.db.models import Sum, F, Q, Count
+from django.utils import timezone
+
+from .models import ActivityLog, DailyFootprint, UserProfile, SCORE_PER_LOG
+from .emissions import co2_expression
+
+LEADERBOARD_SIZE = 10
+PROJECTION_WINDOW_DAYS = 60   # trailing days of rollups the projections are fitted on
+
+
+def _apply_delta(user_id, co2, logs):
+    """
+    Shifts a user's leaderboard aggregates by (co2, logs) in one UPDATE.
+    Falls back to a full recompute if the profile doesn't exist yet.
+    """
+    updated = UserProfile.objects.filter(user_id=user_id).update(
+        total_co2=F("total_co2") + co2,
+        log_count=F("log_count") + logs,
+        score=F("score") + (logs * SCORE_PER_LOG - co2),
+    )
+    if not updated:
+        recompute_profile(user_id)
+
+
+def record_activity(log, new_row=True):
+    """
+    Called after a new ActivityLog row is inserted, or with new_row=False
+    after the counts in `log` were added to the user's existing row.
+    """
+    _apply_delta(log.user_id, log.co2, 1 if new_row else 0)
+
+
+def record_deletion(log):
+    """Called after a single ActivityLog row is deleted."""
+    _apply_delta(log.user_id, -log.co2, -1)
+
+
+def recompute_profile(user_id):
+    """
+    Rebuilds one user's total_co2 / log_count / score from their logs.
+    Used when a log is edited in place or when the profile is missing.
+    """
+    agg = ActivityLog.objects.filter(user_id=user_id).aggregate(
+        total_co2=Sum(co2_expression()),
+        log_count=Count("id"),
+    )
+    total = agg["total_co2"] or 0.0
+    logs = agg["log_count"] or 0
+
+    UserProfile.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            "total_co2": total,
+            "log_count": logs,
+            "score": logs * SCORE_PER_LOG - total,
+        },
+    )
+
+
+def recompute_profiles(user_ids):
+    """
+    Batch version of recompute_profile: one grouped aggregate for all the
+    given users, then a bulk update/insert of their profiles.
+    """
+    user_ids = set(user_ids)
+    agg = {
+        row["user_id"]: row
+        for row in ActivityLog.objects.filter(user_id__in=user_ids)
+        .values("user_id")
+        .annotate(total=Sum(co2_expression()), logs=Count("id"))
+    }
+    existing = {p.user_id: p for p in UserProfile.objects.filter(user_id__in=user_ids)}
+
+    new_profiles = []
+    for user_id in user_ids:
+        row = agg.get(user_id, {})
+        total = row.get("total") or 0.0
+        logs = row.get("logs") or 0
+        profile = existing.get(user_id)
+        if profile is None:
+            profile = UserProfile(user_id=user_id)
+            new_profiles.append(profile)
+        profile.total_co2 = total
+        profile.log_count = logs
+        profile.score = logs * SCORE_PER_LOG - total
+
+    UserProfile.objects.bulk_update(existing.values(), ["total_co2", "log_count", "score"])
+    UserProfile.objects.bulk_create(new_profiles)
+
+
+def reset_profile(user_id):
+    """Zeroes a user's leaderboard entry after their history is wiped."""
+    UserProfile.objects.update_or_create(
+        user_id=user_id,
+        defaults={"total_co2": 0.0, "log_count": 0, "score": 0.0},
+    )
+
+
+def top_profiles(limit=LEADERBOARD_SIZE):
+    """Top users by hybrid score, served from the score index."""
+    return (
+        UserProfile.objects
+        .select_related("user")
+        .order_by("-score", "id")[:limit]
+    )
+
+
+def ahead_of(profile):
+    """Profiles ranked before `profile`: lower total_co2, ties broken by id."""
+    return UserProfile.objects.filter(
+        Q(total_co2__lt=profile.total_co2) |
+        Q(total_co2=profile.total_co2, id__lt=profile.id)
+    )
+
+
+def rank_of(profile):
+    """
+    1-based position of a profile when ordered by total_co2 (lowest first),
+    ties broken by id. Answered with a single COUNT over the total_co2 index.
+    """
+    return ahead_of(profile).count() + 1
+
+
+def total_users():
+    return UserProfile.objects.count()
+
+
+def projection_rows(user_ids, today):
+    """(user_id, co2) per logged day in the projection window, in date order."""
+    start = today - timedelta(days=PROJECTION_WINDOW_DAYS - 1)
+    return (
+        DailyFootprint.objects.filter(user_id__in=user_ids, date__gte=start)
+        .order_by("user_id", "date")
+        .values_list("user_id", "co2")
+    )
+
+
+def projections(profiles, today=None):
+    """
+    Projected cumulative CO₂ (kg) one week ahead for each profile's user id,
+    fitted for all of them at once from the last PROJECTION_WINDOW_DAYS of
+    the daily rollup, so the cost doesn't grow with history. The window's
+    cumulative series starts from the CO₂ logged before it (the profile
+    total minus the window's sum). Users with too little recent history are
+    left out.
+    """
+    from .forecast import forecast_many
+
+    series = {profile.user_id: [] for profile in profiles}
+    for user_id, co2 in projection_rows(list(series), today or timezone.localdate()):
+        points = series[user_id]
+        points.append((points[-1] if points else 0.0) + co2)
+
+    earlier = {
+        profile.user_id: profile.total_co2 - (series[profile.user_id] or [0.0])[-1]
+        for profile in profiles
+    }
+    ids = list(series)
+    forecasts = forecast_many([series[user_id] for user_id in ids])
+    return {
+        user_id: round(float(earlier[user_id] + value), 2)
+        for user_id, value in zip(ids, forecasts)
+        if value == value  # skip NaN
+    }
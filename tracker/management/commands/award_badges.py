@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tracker import badges
+
+
+class Command(BaseCommand):
+    help = "Evaluate the badge rules for every user and award what they qualify for."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=badges.BATCH_SIZE,
+                            help="Number of users evaluated per batch.")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only evaluate this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        if options["user_ids"]:
+            awarded = badges.evaluate(options["user_ids"])
+        else:
+            awarded = badges.evaluate_all(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Awarded {awarded} badges."))
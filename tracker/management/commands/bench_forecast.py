@@ -0,0 +1,65 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from tracker.forecast import linear_forecast, forecast_many, HORIZON
+from tracker.providers import numpy
+
+
+def sklearn_predict(chart_data):
+    """The per-request path the dashboard used before tracker.forecast."""
+    from sklearn.linear_model import LinearRegression
+
+    np = numpy.get()
+    X = np.arange(len(chart_data)).reshape(-1, 1)
+    y = np.array(chart_data)
+    model = LinearRegression()
+    model.fit(X, y)
+    return float(model.predict([[len(chart_data) + HORIZON]])[0])
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark the closed-form forecaster against scikit-learn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[7, 30, 365, 3650])
+        parser.add_argument("--users", type=int, default=1000,
+                            help="Series count for the batch benchmark.")
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        np = numpy.get()
+        rng = np.random.default_rng(42)
+        repeat = options["repeat"]
+        results = {"single": [], "batch": None}
+
+        for size in options["sizes"]:
+            data = np.cumsum(rng.random(size)).round(2).tolist()
+            closed = linear_forecast(data).value
+            row = {
+                "points": size,
+                "closed_form_us": round(timeit.timeit(lambda: linear_forecast(data), number=repeat) / repeat * 1e6, 1),
+            }
+            try:
+                reference = sklearn_predict(data)
+            except ImportError:
+                row["sklearn_us"] = None
+            else:
+                row["sklearn_us"] = round(timeit.timeit(lambda: sklearn_predict(data), number=repeat) / repeat * 1e6, 1)
+                row["max_abs_diff"] = abs(closed - reference)
+            results["single"].append(row)
+
+        series = [np.cumsum(rng.random(rng.integers(3, 120))).tolist() for _ in range(options["users"])]
+        batch_s = timeit.timeit(lambda: forecast_many(series), number=10) / 10
+        loop_s = timeit.timeit(lambda: [linear_forecast(s) for s in series], number=3) / 3
+        batched = forecast_many(series)
+        looped = np.array([linear_forecast(s).value for s in series])
+        results["batch"] = {
+            "users": len(series),
+            "forecast_many_ms": round(batch_s * 1e3, 2),
+            "per_user_loop_ms": round(loop_s * 1e3, 2),
+            "max_abs_diff": float(np.max(np.abs(batched - looped))),
+        }
+
+        self.stdout.write(json.dumps(results, indent=2))
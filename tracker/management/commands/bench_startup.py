@@ -0,0 +1,52 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+HEAVY_MODULES = ["numpy", "scipy", "sklearn", "google.generativeai", "grpc"]
+
+# What a gunicorn worker does before serving its first request
+BOOT_SCRIPT = f"""
+import importlib, json, sys, django
+django.setup()
+importlib.import_module({settings.ROOT_URLCONF!r})
+print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure cold start time of a worker boot and of `manage.py check`."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+
+    def _time(self, cmd, runs):
+        timings = []
+        output = ""
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = subprocess.run(
+                cmd, cwd=settings.BASE_DIR, env=os.environ.copy(),
+                capture_output=True, text=True, check=True,
+            )
+            timings.append(time.perf_counter() - started)
+            output = result.stdout
+        return timings, output
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+        boot, boot_out = self._time([sys.executable, "-c", BOOT_SCRIPT], runs)
+        check, _ = self._time([sys.executable, "manage.py", "check"], runs)
+
+        report = {
+            "runs": runs,
+            "worker_boot_s": {"median": round(statistics.median(boot), 3), "min": round(min(boot), 3)},
+            "manage_check_s": {"median": round(statistics.median(check), 3), "min": round(min(check), 3)},
+            "heavy_modules_loaded_at_boot": json.loads(boot_out.strip().splitlines()[-1]),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,149 @@
+import json
+import resource
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from tracker import benchdata
+from tracker.gemini_chatbot import StubModel
+from tracker.providers import chat_model
+
+# name -> (method, path, payload builder taking the request number)
+VIEWS = {
+    "dashboard": ("get", "/dashboard/?period=month", None),
+    "leaderboard": ("get", "/leaderboard/", None),
+    "badges": ("get", "/badges/", None),
+    "log_activity": ("post", "/log/", lambda i: {
+        "emails_sent": 20 + i % 30, "drive_storage_gb": 0.5, "github_commits": i % 7,
+    }),
+    # A new question each time, so the reply cache doesn't answer for the model
+    "chatbot": ("post", "/chatbot/", lambda i: json.dumps({"message": f"How can I cut my CO2? #{i}"})),
+}
+
+
+def _scale(value):
+    try:
+        users, days = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise CommandError(f"Scale {value!r} must look like USERSxDAYS, e.g. 100x90")
+    return users, days
+
+
+def _percentiles(samples):
+    ms = sorted(s * 1000 for s in samples)
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "p50": round(cuts[49], 2), "p90": round(cuts[89], 2), "p99": round(cuts[98], 2),
+        "mean": round(statistics.fmean(ms), 2), "max": round(ms[-1], 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed N users x M days, then measure latency percentiles, query counts and "
+        "memory of the main views at each scale (chatbot uses the stub model). Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", nargs="+", default=["10x30", "100x90", "500x180"],
+                            help="USERSxDAYS data sizes to run, smallest first.")
+        parser.add_argument("--requests", type=int, default=30, help="Timed requests per view.")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per view.")
+        parser.add_argument("--views", nargs="+", choices=list(VIEWS), default=list(VIEWS))
+        parser.add_argument("--stub-delay", type=float, default=0.0,
+                            help="Simulated model latency in seconds.")
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        report = {
+            "database": connection.vendor,
+            "requests": options["requests"],
+            "stub_delay_s": options["stub_delay"],
+            "scales": [],
+        }
+        previous_model = chat_model.get() if chat_model.loaded else None
+        chat_model.override(StubModel())
+        try:
+            with override_settings(CHATBOT_STUB_DELAY=options["stub_delay"], TASKS_RUN_EAGERLY=False):
+                for value in options["scales"]:
+                    report["scales"].append(self._run_scale(*_scale(value), options))
+        finally:
+            if previous_model is not None:
+                chat_model.override(previous_model)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+
+    def _run_scale(self, users, days, options):
+        self.stderr.write(f"Scale {users} users x {days} days...")
+        with transaction.atomic():
+            started = time.perf_counter()
+            seeded = benchdata.seed(users, days)
+            result = {
+                "users": users,
+                "days": days,
+                "seed_s": round(time.perf_counter() - started, 2),
+                "views": {},
+            }
+            clients = [self._client(user) for user in seeded[:options["requests"]]]
+            for name in options["views"]:
+                result["views"][name] = self._measure(name, clients, options)
+            result["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Nothing seeded or written by the views is kept
+            transaction.set_rollback(True)
+        return result
+
+    def _client(self, user):
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(user)
+        session = client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+        return client
+
+    def _request(self, client, name, i):
+        method, path, payload = VIEWS[name]
+        if method == "get":
+            return client.get(path)
+        data = payload(i)
+        if isinstance(data, str):
+            return client.post(path, data, content_type="application/json")
+        return client.post(path, data)
+
+    def _measure(self, name, clients, options):
+        for i in range(options["warmup"]):
+            self._request(clients[i % len(clients)], name, i)
+
+        # Requests rotate through the seeded users, so per-user caches start cold
+        timings, query_counts = [], []
+        for i in range(options["requests"]):
+            client = clients[i % len(clients)]
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self._request(client, name, options["warmup"] + i)
+                timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise CommandError(f"{name} returned {response.status_code}")
+            query_counts.append(len(queries))
+
+        # Allocation peak measured on separate requests: tracemalloc skews timings
+        peaks = []
+        for i in range(3):
+            tracemalloc.start()
+            self._request(clients[i % len(clients)], name, i)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        return {
+            "latency_ms": _percentiles(timings),
+            "queries": {"median": statistics.median(query_counts), "max": max(query_counts)},
+            "peak_alloc_kb": round(max(peaks) / 1024, 1),
+        }
@@ -0,0 +1,126 @@
+import json
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from tracker.db_router import REPLICA, REPLICA_MODELS, replica_configured
+from tracker.gemini_chatbot import StubModel
+from tracker.models import UserProfile
+from tracker.providers import chat_model
+
+# name -> (method, path, payload, alias expected to serve the reads)
+REQUESTS = [
+    # Dashboard numbers and the snapshot are cached, so they are filled from the primary
+    ("dashboard (cache fill)", "get", "/dashboard/?period=month", None, DEFAULT_DB_ALIAS),
+    ("leaderboard", "get", "/leaderboard/", None, REPLICA),
+    ("badges", "get", "/badges/", None, REPLICA),
+    ("chatbot (cache fill)", "post", "/chatbot/", json.dumps({"message": "How am I doing?"}), DEFAULT_DB_ALIAS),
+    ("history api (not marked)", "get", "/api/activity/", None, DEFAULT_DB_ALIAS),
+    ("log activity (write)", "post", "/log/", {"emails_sent": 1, "drive_storage_gb": 0, "github_commits": 0},
+     DEFAULT_DB_ALIAS),
+    ("dashboard right after a write", "get", "/dashboard/?period=month", None, DEFAULT_DB_ALIAS),
+]
+
+
+def _tables_read(queries):
+    return {
+        table for query in queries.captured_queries if query["sql"].startswith("SELECT")
+        for table in re.findall(r'\bFROM [`"]?(\w+)', query["sql"])
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the read-heavy views read from the replica alias, that writes and "
+        "recently-writing sessions stay on the primary, and that connections persist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="User to browse as (default: any user with a profile).")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(f"No {REPLICA!r} database configured (set DB_REPLICA_HOST).")
+        profiles = UserProfile.objects.select_related("user")
+        if options["username"]:
+            profiles = profiles.filter(user__username=options["username"])
+        profile = profiles.first()
+        if profile is None:
+            raise CommandError("No user with activity to browse as.")
+
+        failures = self._check_routing(profile.user) + self._check_connections()
+        if failures:
+            raise CommandError(f"{failures} check(s) failed.")
+        self.stdout.write(self.style.SUCCESS("Routing and connection checks passed."))
+
+    def _check_routing(self, user):
+        failures = 0
+        previous_model = chat_model.get() if chat_model.loaded else None
+        chat_model.override(StubModel())
+        try:
+            # The write (and the test session) are rolled back afterwards
+            with override_settings(CHATBOT_STUB_DELAY=0), transaction.atomic():
+                client = Client(HTTP_HOST="localhost")
+                client.force_login(user)
+                session = client.session
+                session["can_visit_dashboard"] = True
+                session.save()
+                for name, method, path, payload, expected in REQUESTS:
+                    failures += self._request(client, name, method, path, payload, expected)
+                transaction.set_rollback(True)
+        finally:
+            if previous_model is not None:
+                chat_model.override(previous_model)
+        return failures
+
+    def _request(self, client, name, method, path, payload, expected):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            if method == "get":
+                response = client.get(path)
+            elif isinstance(payload, str):
+                response = client.post(path, payload, content_type="application/json")
+            else:
+                response = client.post(path, payload)
+            if hasattr(response, "streaming_content"):
+                b"".join(response.streaming_content)
+        used = {DEFAULT_DB_ALIAS: len(primary), REPLICA: len(replica)}
+        # Session, auth and cache reads stay on the primary; the view's
+        # activity reads must not (a view answered from the cache reads none)
+        activity_tables = {apps.get_model(label)._meta.db_table for label in REPLICA_MODELS}
+        if expected == REPLICA:
+            ok = not _tables_read(primary) & activity_tables
+        else:
+            ok = used[REPLICA] == 0
+        stray = _tables_read(replica) - activity_tables
+        ok = ok and not stray and response.status_code < 400
+        self.stdout.write(
+            f"{'ok  ' if ok else 'FAIL'}  {name}: HTTP {response.status_code}, "
+            f"{used[DEFAULT_DB_ALIAS]} queries on {DEFAULT_DB_ALIAS}, {used[REPLICA]} on {REPLICA}"
+            + (f" (also read {', '.join(sorted(stray))} there)" if stray else "")
+        )
+        return 0 if ok else 1
+
+    def _check_connections(self):
+        failures = 0
+        for alias in (DEFAULT_DB_ALIAS, REPLICA):
+            connection = connections[alias]
+            connection.ensure_connection()
+            before = connection.connection
+            # What Django runs at the end of every request
+            close_old_connections()
+            connection.ensure_connection()
+            persistent = connection.connection is before
+            max_age = connection.settings_dict["CONN_MAX_AGE"]
+            health = connection.settings_dict["CONN_HEALTH_CHECKS"]
+            ok = persistent == bool(max_age) and health
+            self.stdout.write(
+                f"{'ok  ' if ok else 'FAIL'}  {alias} connection: CONN_MAX_AGE={max_age}, "
+                f"CONN_HEALTH_CHECKS={health}, reused across requests={persistent}"
+            )
+            failures += 0 if ok else 1
+        return failures
@@ -0,0 +1,141 @@
+import json
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tracker import benchdata, leaderboard, queries, snapshot, export
+from tracker.models import ActivityLog, UserProfile
+
+
+def hot_queries(user, today):
+    """(name, queryset) for the query shapes the views and signals run per request."""
+    profile = UserProfile.objects.get(user=user)
+    start = today - timedelta(days=30)
+    counts = ("emails_sent", "drive_storage_gb", "github_commits")
+    last = (0, start)   # a chunk boundary, as (id, date)
+    return [
+        ("dashboard: period logs", queries.user_logs(user, start).order_by("date")),
+        ("dashboard: period totals", queries.user_days(user, start).values_list("co2", *counts)),
+        ("dashboard: daily series", queries.user_days(user, start).order_by("date").values_list("date", "co2")),
+        # rank_of() runs COUNT(*) over this queryset
+        ("dashboard: rank", leaderboard.ahead_of(profile).order_by().values("id")),
+        ("leaderboard: top profiles", leaderboard.top_profiles()),
+        ("leaderboard: projections", leaderboard.projection_rows(
+            [p.user_id for p in leaderboard.top_profiles()], today)),
+        ("snapshot: user context", snapshot.query(user.id, today)),
+        ("signals: refresh day", ActivityLog.objects.filter(user=user, date=today).values_list(*counts)),
+        ("signals: recompute profile", ActivityLog.objects.filter(user=user).values_list("date", *counts)),
+        ("export: user chunk", export._page(export.queryset_for(user).values_list(*export._VALUES), last)),
+        ("export: all-users chunk", export._page(export.queryset_for().values_list(*export._VALUES), last)),
+    ]
+
+
+# --- Plan inspection, per backend ---
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _sqlite_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        scan = re.search(r"\bSCAN (\w+)(.*)", line)
+        if scan and "USING" not in scan.group(2):
+            problems.append(f"full scan of {scan.group(1)}")
+        if "USE TEMP B-TREE FOR" in line:
+            problems.append("sort without an index")
+    return problems
+
+
+def _mysql_problems(plan):
+    problems = []
+    for node in _walk(json.loads(plan)):
+        if node.get("access_type") == "ALL":
+            problems.append(f"full scan of {node.get('table_name')}")
+        if node.get("using_filesort"):
+            problems.append("filesort")
+    return problems
+
+
+def _postgresql_problems(plan):
+    problems = []
+    for node in _walk(json.loads(plan)):
+        if node.get("Node Type") == "Seq Scan":
+            problems.append(f"full scan of {node.get('Relation Name')}")
+        if node.get("Node Type") == "Sort":
+            problems.append("sort without an index")
+    return problems
+
+
+PLAN_CHECKS = {
+    "sqlite": (None, _sqlite_problems),
+    "mysql": ("JSON", _mysql_problems),
+    "postgresql": ("JSON", _postgresql_problems),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot ActivityLog/rollup queries against a seeded database "
+        "and fail on full table scans or unindexed sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200,
+                            help="Users to seed (rolled back afterwards).")
+        parser.add_argument("--days", type=int, default=90,
+                            help="Days of activity seeded per user.")
+        parser.add_argument("--no-seed", action="store_true",
+                            help="Check against the existing data instead of seeding.")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_CHECKS:
+            raise CommandError(f"No plan checks for the {connection.vendor} backend.")
+        explain_format, find_problems = PLAN_CHECKS[connection.vendor]
+        today = timezone.now().date()
+
+        failures = []
+        with transaction.atomic():
+            if options["no_seed"]:
+                user = User.objects.filter(tracker_profile__isnull=False).first()
+                if user is None:
+                    raise CommandError("No users with a profile to check against.")
+            else:
+                user = self._seed(options["users"], options["days"])
+
+            for name, queryset in hot_queries(user, today):
+                plan = queryset.explain(format=explain_format) if explain_format else queryset.explain()
+                problems = find_problems(plan)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"-- {name}\n{plan}\n")
+                if problems:
+                    failures.append(f"{name}: {', '.join(sorted(set(problems)))}")
+                    self.stdout.write(self.style.ERROR(f"FAIL  {name}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok    {name}"))
+
+            # Seeded rows are never kept
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError("Query plan regressions:\n  " + "\n  ".join(failures))
+
+    def _seed(self, users, days):
+        self.stdout.write(f"Seeding {users} users x {days} days...")
+        created = benchdata.seed(users, days, prefix="plancheck")
+        # Fresh statistics so the planner sees realistic row counts
+        # (MySQL's ANALYZE TABLE would commit the seed, so it is skipped there)
+        if connection.vendor != "mysql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        return created[len(created) // 2]
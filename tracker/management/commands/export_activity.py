@@ -0,0 +1,31 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker import export
+
+
+class Command(BaseCommand):
+    help = "Stream ActivityLog history (one user or everyone) as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to export (default: all users).")
+        parser.add_argument("--format", choices=list(export.FORMATS), default="csv")
+        parser.add_argument("--output", help="File path (default: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        lines = export.stream(export.queryset_for(user), options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
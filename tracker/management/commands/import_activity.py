@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker import ingest
+
+
+class Command(BaseCommand):
+    help = "Bulk import ActivityLog rows from a CSV, JSON or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "json", "ndjson"],
+                            help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=ingest.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ingest.guess_format(path)
+        try:
+            with open(path, "rb") as f:
+                result = ingest.import_rows(ingest.read_rows(f, fmt), options["batch_size"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors[:20]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        if len(result.errors) > 20:
+            self.stderr.write(f"... and {len(result.errors) - 20} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows - len(result.errors)}/{result.rows} rows in {result.seconds:.2f}s "
+            f"({result.rows_per_sec} rows/sec): {result.created} new days, {result.updated} days added to."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tracker import rollups
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the daily/weekly CO₂ rollups from ActivityLog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Number of users processed per transaction.")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only rebuild this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        days, weeks = rollups.rebuild(
+            user_ids=options["user_ids"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {days} daily and {weeks} weekly rollup rows."
+        ))
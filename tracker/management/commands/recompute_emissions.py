@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.signals import recompute_emissions
+
+
+class Command(BaseCommand):
+    help = "Re-price rollups and leaderboard totals with the current emission factors."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", required=True,
+                            help="First affected date (YYYY-MM-DD), usually the new version's effective_from.")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options["since"])
+        except ValueError:
+            raise CommandError("--since must be YYYY-MM-DD")
+        recompute_emissions(since)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed CO₂ aggregates from {since}."))
@@ -0,0 +1,57 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tracker import taskqueue
+
+
+def _work(batch_size, once):
+    # Each process opens its own database connections
+    connections.close_all()
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    try:
+        taskqueue.work(batch_size=batch_size, once=once, should_stop=lambda: bool(stopping))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (recomputations, badge checks) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Worker processes claiming jobs in parallel.")
+        parser.add_argument("--batch-size", type=int, default=10,
+                            help="Jobs claimed per poll.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue has no due jobs.")
+
+    def handle(self, *args, **options):
+        batch_size, once = options["batch_size"], options["once"]
+        if options["processes"] <= 1:
+            _work(batch_size, once)
+            return
+
+        # Children must not inherit the parent's open connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_work, args=(batch_size, once), name=f"tracker-worker-{i}")
+            for i in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} worker processes.")
+
+        def stop(*_):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()   # SIGTERM: finish the current job, then exit
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for worker in workers:
+            worker.join()
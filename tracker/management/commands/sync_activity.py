@@ -0,0 +1,48 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker import connectors
+from tracker.connectors import fakes
+
+
+class Command(BaseCommand):
+    help = (
+        "Pull new Gmail, Drive and GitHub activity for the opted-in users into ActivityLog "
+        "(run it from cron). --fake runs against local fake APIs instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", nargs="+", choices=list(connectors.CONNECTORS),
+                            help="Sources to sync (default: all).")
+        parser.add_argument("--user", type=int, nargs="+", help="Only sync these user ids.")
+        parser.add_argument("--workers", type=int, help="Concurrent API calls (default: SYNC_MAX_WORKERS).")
+        parser.add_argument("--fake", action="store_true",
+                            help="Sync against local fake APIs with fake tokens; rolled back unless --keep.")
+        parser.add_argument("--fail-every", type=int, default=0,
+                            help="With --fake, answer every Nth request with a 429.")
+        parser.add_argument("--keep", action="store_true", help="With --fake, keep the synced rows.")
+
+    def handle(self, *args, **options):
+        sources = options["source"] or list(connectors.CONNECTORS)
+        if not options["fake"]:
+            report = connectors.sync(sources, options["user"], max_workers=options["workers"])
+            self._write(report.as_dict())
+            return
+
+        user_ids = options["user"] or list(User.objects.values_list("id", flat=True))
+        with fakes.FakeAPIServer(fail_every=options["fail_every"]) as server, transaction.atomic():
+            report = connectors.sync(
+                sources,
+                accounts=fakes.accounts_for(user_ids, sources),
+                base_urls=server.base_urls(),
+                max_workers=options["workers"],
+            ).as_dict()
+            report["fake_api"] = dict(server.counts)
+            transaction.set_rollback(not options["keep"])
+        self._write(report)
+
+    def _write(self, report):
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,126 @@
+"""
+In-process request metrics, exposed at /metrics in the Prometheus text format.
+
+Counters and histograms live in this process's memory (no client library,
+no external service); each gunicorn worker keeps and serves its own set, so
+scrape every worker or aggregate by instance. With METRICS_ENABLED off,
+every inc()/observe() returns straight away.
+"""
+import bisect
+import threading
+
+from django.conf import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_lock = threading.Lock()
+_registry = []
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # label values -> [per-bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labels)
+        with _lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "dcf_http_request_duration_seconds", "Time to response headers per view.",
+    labels=("view", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "dcf_http_request_db_queries", "Database queries per request.",
+    labels=("view",), buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Counter(
+    "dcf_http_request_db_seconds_total", "Time spent in database queries.", labels=("view",),
+)
+CACHE_LOOKUPS = Counter(
+    "dcf_cache_lookups_total", "Cache lookups by cache and result (hit/miss).", labels=("cache", "result"),
+)
+GEMINI_SECONDS = Histogram(
+    "dcf_gemini_request_duration_seconds", "Outbound model call latency.", labels=("mode",),
+)
+GEMINI_PROMPT_CHARS = Histogram(
+    "dcf_gemini_prompt_chars", "Prompt size sent to the model, in characters.",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000),
+)
+GEMINI_FAILURES = Counter(
+    "dcf_gemini_failures_total", "Model calls that ended in a fallback reply.", labels=("reason",),
+)
+
+
+def _hit_ratios():
+    lookups = {}
+    for (cache, result), value in CACHE_LOOKUPS._values.items():
+        lookups.setdefault(cache, {})[result] = value
+    lines = ["# HELP dcf_cache_hit_ratio Share of lookups served from cache.", "# TYPE dcf_cache_hit_ratio gauge"]
+    for cache, results in sorted(lookups.items()):
+        total = results.get("hit", 0) + results.get("miss", 0)
+        lines.append(f'dcf_cache_hit_ratio{{cache="{cache}"}} {results.get("hit", 0) / total if total else 0}')
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        lines = [line for metric in _registry for line in metric.render()]
+        lines += _hit_ratios()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,79 @@
+"""
+Per-request timing and query instrumentation.
+
+MetricsMiddleware records latency, query count and DB time for every view
+into tracker.metrics, and logs requests slower than SLOW_REQUEST_MS along
+with their slowest SQL statements. When METRICS_ENABLED is off it removes
+itself from the chain at startup (MiddlewareNotUsed), so it costs nothing.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+slow_log = logging.getLogger("tracker.slow_requests")
+
+UNRESOLVED = "<unresolved>"
+
+
+class _QueryRecorder:
+    """execute_wrapper hook that counts and times every query."""
+
+    def __init__(self, keep_sql):
+        self.keep_sql = keep_sql
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.keep_sql:
+                self.statements.append((elapsed, sql))
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _QueryRecorder(keep_sql=settings.SLOW_REQUEST_MS > 0)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        # Streaming responses are timed to their headers, not the last chunk
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else UNRESOLVED
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(recorder.count, view=view)
+        metrics.REQUEST_DB_SECONDS.inc(recorder.seconds, view=view)
+
+        if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            self._log_slow(request, view, elapsed, recorder)
+        return response
+
+    def _log_slow(self, request, view, elapsed, recorder):
+        worst = sorted(recorder.statements, key=lambda s: s[0], reverse=True)
+        lines = [
+            f"Slow request {request.method} {request.path} ({view}): {elapsed * 1000:.0f} ms, "
+            f"{recorder.count} queries, {recorder.seconds * 1000:.0f} ms in the database"
+        ]
+        for seconds, sql in worst[:settings.SLOW_REQUEST_SQL_LIMIT]:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {sql[:1000]}")
+        slow_log.warning("\n".join(lines))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, F, FloatField, ExpressionWrapper, Count
+
+
+def backfill_leaderboard(apps, schema_editor):
+    """Seed log_count / score (and fix total_co2) with one grouped query."""
+    ActivityLog = apps.get_model('tracker', 'ActivityLog')
+    UserProfile = apps.get_model('tracker', 'UserProfile')
+
+    rows = ActivityLog.objects.values('user_id').annotate(
+        total_co2=Sum(ExpressionWrapper(
+            F('emails_sent') * 0.004 +
+            F('drive_storage_gb') * 1.1 +
+            F('github_commits') * 0.0005,
+            output_field=FloatField(),
+        )),
+        log_count=Count('id'),
+    )
+    for row in rows:
+        total = row['total_co2'] or 0.0
+        UserProfile.objects.update_or_create(
+            user_id=row['user_id'],
+            defaults={
+                'total_co2': total,
+                'log_count': row['log_count'],
+                'score': row['log_count'] * 10 - total,
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_badge_userbadge_userprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='log_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-score'], name='tracker_profile_score_idx'),
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Sum, F, FloatField, ExpressionWrapper, Count
+
+
+def clear_weekly_rollups(apps, schema_editor):
+    # CarbonFootprint was never written by the app; it is rebuilt below
+    apps.get_model('tracker', 'CarbonFootprint').objects.all().delete()
+
+
+def backfill_rollups(apps, schema_editor):
+    ActivityLog = apps.get_model('tracker', 'ActivityLog')
+    DailyFootprint = apps.get_model('tracker', 'DailyFootprint')
+    CarbonFootprint = apps.get_model('tracker', 'CarbonFootprint')
+
+    rows = ActivityLog.objects.values('user_id', 'date').annotate(
+        emails=Sum('emails_sent'),
+        drive=Sum('drive_storage_gb'),
+        commits=Sum('github_commits'),
+        co2=Sum(ExpressionWrapper(
+            F('emails_sent') * 0.004 +
+            F('drive_storage_gb') * 1.1 +
+            F('github_commits') * 0.0005,
+            output_field=FloatField(),
+        )),
+        logs=Count('id'),
+    )
+    daily = []
+    weekly = {}
+    for row in rows:
+        daily.append(DailyFootprint(
+            user_id=row['user_id'], date=row['date'],
+            emails_sent=row['emails'], drive_storage_gb=row['drive'],
+            github_commits=row['commits'], co2=row['co2'], log_count=row['logs'],
+        ))
+        start = row['date'] - timedelta(days=row['date'].weekday())
+        week = weekly.setdefault((row['user_id'], start), [0, 0.0, 0])
+        week[0] += row['emails']
+        week[1] += row['drive']
+        week[2] += row['commits']
+
+    DailyFootprint.objects.bulk_create(daily, batch_size=1000)
+    CarbonFootprint.objects.bulk_create([
+        CarbonFootprint(
+            user_id=user_id, week_start=start,
+            co2_emails=emails * 0.004, co2_drive=drive * 1.1, co2_github=commits * 0.0005,
+        )
+        for (user_id, start), (emails, drive, commits) in weekly.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_userprofile_total_co2_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFootprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('emails_sent', models.IntegerField(default=0)),
+                ('drive_storage_gb', models.FloatField(default=0)),
+                ('github_commits', models.IntegerField(default=0)),
+                ('co2', models.FloatField(default=0)),
+                ('log_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(clear_weekly_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='carbonfootprint',
+            constraint=models.UniqueConstraint(fields=('user', 'week_start'), name='unique_weekly_footprint'),
+        ),
+        migrations.AddField(
+            model_name='dailyfootprint',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyfootprint',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_footprint'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_footprint_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmissionFactorVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateField(unique=True)),
+                ('co2_per_email', models.FloatField(default=0.004)),
+                ('co2_per_gb', models.FloatField(default=1.1)),
+                ('co2_per_commit', models.FloatField(default=0.0005)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_emission_factor_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'date'], name='tracker_log_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'date', 'emails_sent', 'drive_storage_gb', 'github_commits'], name='tracker_log_user_cover_idx'),
+        ),
+    ]
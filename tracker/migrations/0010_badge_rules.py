@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def tag_first_log_badge(apps, schema_editor):
+    # The badge the old view created on the fly becomes the "first-log" rule's
+    Badge = apps.get_model('tracker', 'Badge')
+    badge = Badge.objects.filter(name='First Activity Logged').order_by('id').first()
+    if badge:
+        badge.code = 'first-log'
+        badge.save(update_fields=['code'])
+
+
+def drop_duplicate_awards(apps, schema_editor):
+    UserBadge = apps.get_model('tracker', 'UserBadge')
+    keep = (
+        UserBadge.objects.values('user_id', 'badge_id')
+        .annotate(first=Min('id')).values_list('first', flat=True)
+    )
+    UserBadge.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_activitylog_user_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='badge',
+            name='code',
+            field=models.SlugField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(tag_first_log_badge, migrations.RunPython.noop),
+        migrations.RunPython(drop_duplicate_awards, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userbadge',
+            constraint=models.UniqueConstraint(fields=('user', 'badge'), name='unique_user_badge'),
+        ),
+    ]
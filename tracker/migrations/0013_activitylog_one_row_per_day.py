@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:38
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import Count, F, Q
+
+BATCH_SIZE = 500
+SCORE_PER_LOG = 10  # tracker.models.SCORE_PER_LOG when this migration was written
+COUNT_FIELDS = ['emails_sent', 'drive_storage_gb', 'github_commits']
+
+
+def compact_duplicates(apps, schema_editor):
+    # Sums each user-day's rows into its oldest row and deletes the rest,
+    # BATCH_SIZE user-days per transaction. CO2 totals are unchanged (the
+    # counts are only moved); log counts drop to one per logged day.
+    ActivityLog = apps.get_model('tracker', 'ActivityLog')
+    DailyFootprint = apps.get_model('tracker', 'DailyFootprint')
+    UserProfile = apps.get_model('tracker', 'UserProfile')
+
+    groups = list(
+        ActivityLog.objects.values('user_id', 'date')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+        .order_by('user_id', 'date').values_list('user_id', 'date')
+    )
+    removed = Counter()
+    for i in range(0, len(groups), BATCH_SIZE):
+        lookup = Q()
+        for user_id, day in groups[i:i + BATCH_SIZE]:
+            lookup |= Q(user_id=user_id, date=day)
+        with transaction.atomic():
+            keepers, extra = {}, []
+            for log in ActivityLog.objects.filter(lookup).order_by('id'):
+                keeper = keepers.setdefault((log.user_id, log.date), log)
+                if keeper is not log:
+                    for name in COUNT_FIELDS:
+                        setattr(keeper, name, getattr(keeper, name) + getattr(log, name))
+                    extra.append(log.id)
+                    removed[log.user_id] += 1
+            ActivityLog.objects.bulk_update(keepers.values(), COUNT_FIELDS)
+            ActivityLog.objects.filter(id__in=extra).delete()
+
+    DailyFootprint.objects.filter(log_count__gt=1).update(log_count=1)
+    for user_id, count in removed.items():
+        UserProfile.objects.filter(user_id=user_id).update(
+            log_count=F('log_count') - count,
+            score=F('score') - count * SCORE_PER_LOG,
+        )
+
+
+class Migration(migrations.Migration):
+
+    # The compaction commits batch by batch instead of in one long transaction
+    atomic = False
+
+    dependencies = [
+        ('tracker', '0012_sync_cursors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activitylog',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_activity'),
+        ),
+        # Superseded by the constraint's index
+        migrations.RemoveIndex(
+            model_name='activitylog',
+            name='tracker_log_user_date_idx',
+        ),
+    ]
@@ -2,6 +2,18 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+# Baseline emission factors; EmissionFactorVersion rows override them from
+# their effective date onwards (see tracker.emissions)
+CO2_EMAIL = 0.004      # 4 g per email
+CO2_DRIVE = 1.1        # 1.1 kg per GB/month
+CO2_COMMIT = 0.0005    # 0.5 g per commit
+
+# Hybrid leaderboard score: reward more logs, penalize high emissions
+SCORE_PER_LOG = 10
+
+DAILY_CO2_GOAL = 1.0   # Daily CO₂ goal in kg
+
+
 class ActivityLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     date = models.DateField(default=timezone.now)
@@ -9,33 +21,101 @@ class ActivityLog(models.Model):
     drive_storage_gb = models.FloatField(default=0)
     github_commits = models.IntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            # One row per user-day (tracker.activity.record_day merges into it);
+            # its index also serves per-user date lookups, ranges and ordering
+            models.UniqueConstraint(fields=["user", "date"], name="unique_daily_activity"),
+        ]
+        indexes = [
+            # Lets the per-user/per-day aggregates read the index alone
+            models.Index(
+                fields=["user", "date", "emails_sent", "drive_storage_gb", "github_commits"],
+                name="tracker_log_user_cover_idx",
+            ),
+        ]
+
+    @property
+    def co2(self):
+        from .emissions import compute_co2
+        return compute_co2(self.emails_sent, self.drive_storage_gb, self.github_commits, self.date)
+
     def __str__(self):
         return f"{self.user.username} - {self.date}"
 
+# Effective-dated emission factors (kg CO₂ per unit)
+class EmissionFactorVersion(models.Model):
+    effective_from = models.DateField(unique=True)
+    co2_per_email = models.FloatField(default=CO2_EMAIL)
+    co2_per_gb = models.FloatField(default=CO2_DRIVE)
+    co2_per_commit = models.FloatField(default=CO2_COMMIT)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Emission factors from {self.effective_from}"
+
+
+# Weekly CO₂ rollup (week_start is a Monday), maintained by tracker.rollups
 class CarbonFootprint(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     week_start = models.DateField()
     co2_emails = models.FloatField(default=0)
     co2_drive = models.FloatField(default=0)
     co2_github = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "week_start"], name="unique_weekly_footprint"),
+        ]
+
     @property
     def total_co2(self):
         return self.co2_emails + self.co2_drive + self.co2_github
 
     def __str__(self):
         return f"{self.user.username} - {self.week_start}"
-    
+
+
+# Daily rollup of a user's activity, maintained by tracker.rollups
+class DailyFootprint(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    emails_sent = models.IntegerField(default=0)
+    drive_storage_gb = models.FloatField(default=0)
+    github_commits = models.IntegerField(default=0)
+    co2 = models.FloatField(default=0)
+    log_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_daily_footprint"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
+
 
 # User Profile to track total CO2
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="tracker_profile")
     total_co2 = models.FloatField(default=0.0)
+    log_count = models.IntegerField(default=0)
+    score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="tracker_profile_score_idx"),
+            models.Index(fields=["total_co2", "id"], name="tracker_profile_co2_idx"),
+        ]
 
     def __str__(self):
         return self.user.username
 
 # Badges for achievements
 class Badge(models.Model):
+    # Rule code from tracker.badges.RULES; blank for hand-made badges
+    code = models.SlugField(max_length=50, unique=True, null=True, blank=True)
     name = models.CharField(max_length=50)
     description = models.TextField()
     icon = models.CharField(max_length=50, default="🏆")  # emoji or icon class
@@ -49,6 +129,57 @@ class UserBadge(models.Model):
     badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
     awarded_on = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "badge"], name="unique_user_badge"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.badge.name}"
 
+
+
+# Deferred work for the run_worker process (see tracker.taskqueue)
+class Task(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Set while pending so identical jobs collapse into one; cleared once claimed
+    dedup_key = models.CharField(max_length=40, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="tracker_task_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{tuple(self.args)} [{self.status}]"
+
+
+# Where the last Gmail / Drive / GitHub sync stopped for a user (see tracker.connectors)
+class SyncCursor(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    source = models.CharField(max_length=20)
+    last_synced = models.DateField(null=True, blank=True)
+    etag = models.CharField(max_length=200, blank=True)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "source"], name="unique_sync_cursor"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.source} @ {self.last_synced}"
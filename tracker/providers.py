@@ -0,0 +1,59 @@
+"""
+Lazily-initialised heavy dependencies.
+
+Gemini (grpc/protobuf) and numpy take a noticeable time to import,
+so nothing imports them at module load. A Provider builds its object on the
+first get() and then hands back the same instance from every thread.
+"""
+import importlib
+import threading
+
+from django.conf import settings
+
+
+class Provider:
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def override(self, value):
+        """Replaces the provided object (e.g. a stub model in load tests)."""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+
+def _build_chat_model():
+    if settings.CHATBOT_BACKEND == "stub":
+        from .gemini_chatbot import StubModel
+        return StubModel()
+
+    import os
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(settings.GEMINI_MODEL)
+
+
+def _module(name):
+    return lambda: importlib.import_module(name)
+
+
+chat_model = Provider(_build_chat_model)
+numpy = Provider(_module("numpy"))
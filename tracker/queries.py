@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import ActivityLog, DailyFootprint
+
+
+def period_start(period, today):
+    """First date of a dashboard period ("week", "month"); None means all time."""
+    if period == "week":
+        return today - timedelta(days=7)
+    if period == "month":
+        return today - timedelta(days=30)
+    return None
+
+
+def user_logs(user, start_date=None):
+    logs = ActivityLog.objects.filter(user=user)
+    if start_date:
+        logs = logs.filter(date__gte=start_date)
+    return logs
+
+
+def user_days(user, start_date=None):
+    days = DailyFootprint.objects.filter(user=user)
+    if start_date:
+        days = days.filter(date__gte=start_date)
+    return days
+
+
+def period_totals(user, start_date=None):
+    """
+    Totals for the dashboard cards, summed from the daily rollup in one query.
+    Returns a dict with total_co2, total_emails, total_drive, total_commits.
+    """
+    return user_days(user, start_date).aggregate(
+        total_co2=Coalesce(Sum("co2"), Value(0.0)),
+        total_emails=Coalesce(Sum("emails_sent"), Value(0)),
+        total_drive=Coalesce(Sum("drive_storage_gb"), Value(0.0)),
+        total_commits=Coalesce(Sum("github_commits"), Value(0)),
+    )
+
+
+def daily_co2_series(user, start_date=None):
+    """List of (date, co2_kg) tuples, one per logged day, oldest first."""
+    return list(
+        user_days(user, start_date)
+        .order_by("date")
+        .values_list("date", "co2")
+    )
+
+
+def cumulative(series):
+    """Turns a daily (date, co2) series into chart labels and running totals."""
+    labels = []
+    data = []
+    running = 0
+    for day, co2 in series:
+        running += co2 or 0
+        labels.append(day.strftime("%Y-%m-%d"))
+        data.append(round(running, 2))
+    return labels, data
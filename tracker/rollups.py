@@ -0,0 +1,302 @@
+"""
+Daily (DailyFootprint) and weekly (CarbonFootprint) CO₂ rollups.
+
+Inserts and counts merged into an existing day are applied as in-place
+deltas (apply_logs does the same for a bulk_create batch); deletes and edits recompute the
+affected day/week from ActivityLog. `rebuild()` regenerates everything in
+bulk batches and backs the `rebuild_rollups` management command.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, F, Count, Value
+from django.db.models.functions import Coalesce
+
+from . import leaderboard
+from .emissions import compute_co2, co2_expression
+from .models import ActivityLog, CarbonFootprint, DailyFootprint
+
+
+def week_start(day):
+    """Monday of the week containing `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def _upsert(model, lookup, deltas):
+    """Adds `deltas` to the row matching `lookup`, creating it if needed."""
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**increments)
+
+
+def apply_log(log, new_row=True):
+    """
+    Adds a freshly inserted ActivityLog to its day and week. With
+    new_row=False, `log` holds counts merged into an existing row instead.
+    """
+    co2_emails, co2_drive, co2_github = compute_co2(
+        log.emails_sent, log.drive_storage_gb, log.github_commits, log.date, components=True,
+    )
+    _upsert(DailyFootprint, {"user_id": log.user_id, "date": log.date}, {
+        "emails_sent": log.emails_sent,
+        "drive_storage_gb": log.drive_storage_gb,
+        "github_commits": log.github_commits,
+        "co2": co2_emails + co2_drive + co2_github,
+        "log_count": 1 if new_row else 0,
+    })
+    _upsert(CarbonFootprint, {"user_id": log.user_id, "week_start": week_start(log.date)}, {
+        "co2_emails": co2_emails,
+        "co2_drive": co2_drive,
+        "co2_github": co2_github,
+    })
+
+
+def apply_logs(logs):
+    """
+    Batch version of apply_log for bulk inserts: deltas are summed in memory
+    per user-day and user-week, then merged with one read and one bulk write
+    per table.
+    """
+    co2_emails, co2_drive, co2_github = compute_co2(
+        [log.emails_sent for log in logs],
+        [log.drive_storage_gb for log in logs],
+        [log.github_commits for log in logs],
+        [log.date for log in logs],
+        components=True,
+    )
+
+    days = {}
+    weeks = {}
+    for i, log in enumerate(logs):
+        parts = (float(co2_emails[i]), float(co2_drive[i]), float(co2_github[i]))
+        day = days.setdefault((log.user_id, log.date), [0, 0.0, 0, 0.0, 0])
+        day[0] += log.emails_sent
+        day[1] += log.drive_storage_gb
+        day[2] += log.github_commits
+        day[3] += sum(parts)
+        day[4] += 1
+        week = weeks.setdefault((log.user_id, week_start(log.date)), [0.0, 0.0, 0.0])
+        week[0] += parts[0]
+        week[1] += parts[1]
+        week[2] += parts[2]
+
+    user_ids = {user_id for user_id, _ in days}
+    dates = [d for _, d in days]
+    existing_days = {
+        (row.user_id, row.date): row
+        for row in DailyFootprint.objects.filter(
+            user_id__in=user_ids, date__gte=min(dates), date__lte=max(dates),
+        )
+    }
+    new_days = []
+    for key, (emails, drive, commits, co2, count) in days.items():
+        row = existing_days.get(key)
+        if row is None:
+            row = DailyFootprint(user_id=key[0], date=key[1])
+            new_days.append(row)
+        row.emails_sent += emails
+        row.drive_storage_gb += drive
+        row.github_commits += commits
+        row.co2 += co2
+        row.log_count += count
+    DailyFootprint.objects.bulk_update(
+        [r for k, r in existing_days.items() if k in days],
+        ["emails_sent", "drive_storage_gb", "github_commits", "co2", "log_count"],
+        batch_size=1000,
+    )
+    DailyFootprint.objects.bulk_create(new_days, batch_size=1000)
+
+    starts = [w for _, w in weeks]
+    existing_weeks = {
+        (row.user_id, row.week_start): row
+        for row in CarbonFootprint.objects.filter(
+            user_id__in=user_ids, week_start__gte=min(starts), week_start__lte=max(starts),
+        )
+    }
+    new_weeks = []
+    for key, (emails, drive, github) in weeks.items():
+        row = existing_weeks.get(key)
+        if row is None:
+            row = CarbonFootprint(user_id=key[0], week_start=key[1])
+            new_weeks.append(row)
+        row.co2_emails += emails
+        row.co2_drive += drive
+        row.co2_github += github
+    CarbonFootprint.objects.bulk_update(
+        [r for k, r in existing_weeks.items() if k in weeks],
+        ["co2_emails", "co2_drive", "co2_github"],
+        batch_size=1000,
+    )
+    CarbonFootprint.objects.bulk_create(new_weeks, batch_size=1000)
+
+
+def refresh_day(user_id, day):
+    """Recomputes one user-day and its week from ActivityLog."""
+    agg = ActivityLog.objects.filter(user_id=user_id, date=day).aggregate(
+        emails=Coalesce(Sum("emails_sent"), Value(0)),
+        drive=Coalesce(Sum("drive_storage_gb"), Value(0.0)),
+        commits=Coalesce(Sum("github_commits"), Value(0)),
+        total=Coalesce(Sum(co2_expression()), Value(0.0)),
+        logs=Count("id"),
+    )
+    if agg["logs"]:
+        DailyFootprint.objects.update_or_create(user_id=user_id, date=day, defaults={
+            "emails_sent": agg["emails"],
+            "drive_storage_gb": agg["drive"],
+            "github_commits": agg["commits"],
+            "co2": agg["total"],
+            "log_count": agg["logs"],
+        })
+    else:
+        DailyFootprint.objects.filter(user_id=user_id, date=day).delete()
+    refresh_week(user_id, week_start(day))
+
+
+def refresh_week(user_id, start):
+    days = list(DailyFootprint.objects.filter(
+        user_id=user_id, date__gte=start, date__lt=start + timedelta(days=7),
+    ).values_list("date", "emails_sent", "drive_storage_gb", "github_commits"))
+    if days:
+        CarbonFootprint.objects.update_or_create(
+            user_id=user_id, week_start=start, defaults=_weekly_values(days),
+        )
+    else:
+        CarbonFootprint.objects.filter(user_id=user_id, week_start=start).delete()
+
+
+def _weekly_values(days):
+    """CarbonFootprint columns from (date, emails, drive, commits) day rows."""
+    co2_emails = co2_drive = co2_github = 0.0
+    for day, emails, drive, commits in days:
+        parts = compute_co2(emails, drive, commits, day, components=True)
+        co2_emails += parts[0]
+        co2_drive += parts[1]
+        co2_github += parts[2]
+    return {"co2_emails": co2_emails, "co2_drive": co2_drive, "co2_github": co2_github}
+
+
+def clear_user(user_id):
+    DailyFootprint.objects.filter(user_id=user_id).delete()
+    CarbonFootprint.objects.filter(user_id=user_id).delete()
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """
+    Regenerates the daily and weekly rollups from ActivityLog.
+
+    Works through users in batches of `batch_size`; each batch is one grouped
+    query plus bulk inserts inside a transaction. Returns (days, weeks) written.
+    """
+    users = ActivityLog.objects.values_list("user_id", flat=True).distinct().order_by("user_id")
+    if user_ids is not None:
+        users = users.filter(user_id__in=user_ids)
+        # Users whose logs are all gone still need their old rollups dropped
+        for user_id in set(user_ids) - set(users):
+            clear_user(user_id)
+
+    users = list(users)
+    days_written = weeks_written = 0
+    for i in range(0, len(users), batch_size):
+        batch = users[i:i + batch_size]
+        rows = (
+            ActivityLog.objects.filter(user_id__in=batch)
+            .values("user_id", "date")
+            .annotate(
+                emails=Sum("emails_sent"),
+                drive=Sum("drive_storage_gb"),
+                commits=Sum("github_commits"),
+                co2=Sum(co2_expression()),
+                logs=Count("id"),
+            )
+        )
+
+        daily = []
+        weekly = {}
+        for row in rows:
+            daily.append(DailyFootprint(
+                user_id=row["user_id"],
+                date=row["date"],
+                emails_sent=row["emails"],
+                drive_storage_gb=row["drive"],
+                github_commits=row["commits"],
+                co2=row["co2"],
+                log_count=row["logs"],
+            ))
+            weekly.setdefault((row["user_id"], week_start(row["date"])), []).append(
+                (row["date"], row["emails"], row["drive"], row["commits"])
+            )
+
+        with transaction.atomic():
+            DailyFootprint.objects.filter(user_id__in=batch).delete()
+            CarbonFootprint.objects.filter(user_id__in=batch).delete()
+            DailyFootprint.objects.bulk_create(daily, batch_size=batch_size)
+            CarbonFootprint.objects.bulk_create(
+                [
+                    CarbonFootprint(user_id=user_id, week_start=start, **_weekly_values(days))
+                    for (user_id, start), days in weekly.items()
+                ],
+                batch_size=batch_size,
+            )
+        days_written += len(daily)
+        weeks_written += len(weekly)
+
+    return days_written, weeks_written
+
+
+def recompute_since(day, batch_size=1000):
+    """
+    Re-prices every rollup row dated on/after `day` with the current
+    emission factors (after an EmissionFactorVersion change), then refreshes
+    the affected users' leaderboard totals. Older rows are left untouched.
+    Returns the list of affected user ids.
+    """
+    first_week = week_start(day)
+    users = list(
+        DailyFootprint.objects.filter(date__gte=day)
+        .values_list("user_id", flat=True).distinct().order_by("user_id")
+    )
+    for i in range(0, len(users), batch_size):
+        batch = users[i:i + batch_size]
+        rows = list(
+            DailyFootprint.objects.filter(user_id__in=batch, date__gte=first_week)
+            .order_by("user_id", "date")
+        )
+        co2 = compute_co2(
+            [r.emails_sent for r in rows],
+            [r.drive_storage_gb for r in rows],
+            [r.github_commits for r in rows],
+            [r.date for r in rows],
+        )
+        weekly = {}
+        for row, value in zip(rows, co2):
+            row.co2 = float(value)
+            weekly.setdefault((row.user_id, week_start(row.date)), []).append(
+                (row.date, row.emails_sent, row.drive_storage_gb, row.github_commits)
+            )
+
+        with transaction.atomic():
+            DailyFootprint.objects.bulk_update(
+                [r for r in rows if r.date >= day], ["co2"], batch_size=batch_size,
+            )
+            CarbonFootprint.objects.filter(user_id__in=batch, week_start__gte=first_week).delete()
+            CarbonFootprint.objects.bulk_create(
+                [
+                    CarbonFootprint(user_id=user_id, week_start=start, **_weekly_values(days))
+                    for (user_id, start), days in weekly.items()
+                ],
+                batch_size=batch_size,
+            )
+            leaderboard.recompute_profiles(batch)
+    return users
+
+
+def weekly_co2(user_id, day):
+    """CO₂ (kg) of the week containing `day`, read from the weekly rollup."""
+    week = CarbonFootprint.objects.filter(user_id=user_id, week_start=week_start(day)).first()
+    return week.total_co2 if week else 0.0
@@ -0,0 +1,173 @@
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from . import leaderboard, rollups, dashboard_cache, emissions, badges
+from .models import ActivityLog, EmissionFactorVersion
+from .taskqueue import task
+
+_state = threading.local()
+
+# Sent once after a user's whole ActivityLog history is deleted (kwargs: user)
+history_reset = Signal()
+
+# Sent after ActivityLog.objects.bulk_create, which skips post_save (kwargs: logs)
+bulk_created = Signal()
+
+# Sent after ActivityLog.objects.bulk_update, which skips post_save (kwargs: user_ids)
+bulk_updated = Signal()
+
+# Sent after counts are added to an existing row with a queryset update
+# (kwargs: delta, an unsaved ActivityLog holding the added counts)
+activity_merged = Signal()
+
+
+@contextmanager
+def suspended():
+    """
+    Mutes the ActivityLog receivers for bulk operations that update the
+    aggregates themselves (e.g. reset_dashboard deleting a whole history).
+    """
+    previous = getattr(_state, "suspended", False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def _is_suspended():
+    return getattr(_state, "suspended", False)
+
+
+def _invalidate_caches(user_id):
+    # After commit, so no request can re-cache data from before the change
+    transaction.on_commit(lambda: dashboard_cache.invalidate(user_id))
+
+
+@task("tracker.recompute_user")
+def recompute_user(user_id):
+    """Rebuilds one user's leaderboard totals and rollups from ActivityLog."""
+    leaderboard.recompute_profile(user_id)
+    rollups.rebuild(user_ids=[user_id])
+    _invalidate_caches(user_id)
+
+
+@receiver(post_save, sender=ActivityLog)
+def activity_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _is_suspended():
+        return
+    if created:
+        leaderboard.record_activity(instance)
+        rollups.apply_log(instance)
+        badges.schedule([instance.user_id])
+    else:
+        # Edited in place: we don't know the old values, so rebuild the
+        # user's aggregates on the task queue
+        recompute_user.enqueue(instance.user_id)
+        badges.schedule([instance.user_id])
+    _invalidate_caches(instance.user_id)
+
+
+@receiver(activity_merged)
+def activity_counts_merged(sender, delta, **kwargs):
+    if _is_suspended():
+        return
+    leaderboard.record_activity(delta, new_row=False)
+    rollups.apply_log(delta, new_row=False)
+    badges.schedule([delta.user_id])
+    _invalidate_caches(delta.user_id)
+
+
+def _cascading_from_user(origin):
+    # Deleting a User drops its profile and rollups in the same cascade, so
+    # there is nothing to adjust (and adjusting would re-create them).
+    return isinstance(origin, User) or getattr(origin, "model", None) is User
+
+
+@receiver(post_delete, sender=ActivityLog)
+def activity_deleted(sender, instance, origin=None, **kwargs):
+    if _is_suspended() or _cascading_from_user(origin):
+        return
+    leaderboard.record_deletion(instance)
+    rollups.refresh_day(instance.user_id, instance.date)
+    _invalidate_caches(instance.user_id)
+
+
+@receiver(history_reset)
+def activity_history_reset(sender, user, **kwargs):
+    leaderboard.reset_profile(user.id)
+    rollups.clear_user(user.id)
+    _invalidate_caches(user.id)
+
+
+@receiver(bulk_created)
+def activity_bulk_created(sender, logs, **kwargs):
+    if not logs:
+        return
+    user_ids = {log.user_id for log in logs}
+    leaderboard.recompute_profiles(user_ids)
+    rollups.apply_logs(logs)
+    badges.schedule(user_ids)
+    for user_id in user_ids:
+        _invalidate_caches(user_id)
+
+
+@receiver(bulk_updated)
+def activity_bulk_updated(sender, user_ids, **kwargs):
+    if not user_ids:
+        return
+    # Old values are gone, so the users' aggregates are rebuilt in one batch
+    leaderboard.recompute_profiles(user_ids)
+    rollups.rebuild(user_ids=list(user_ids))
+    badges.schedule(user_ids)
+    for user_id in user_ids:
+        _invalidate_caches(user_id)
+
+
+# --- Emission factor changes ---
+
+@task("tracker.recompute_emissions")
+def recompute_emissions(since):
+    """Re-prices rollups and totals from `since` (date or ISO string) on and drops stale caches."""
+    if isinstance(since, str):
+        since = date.fromisoformat(since)
+    # This process may still hold the previous factor versions
+    emissions.invalidate()
+    for user_id in rollups.recompute_since(since):
+        _invalidate_caches(user_id)
+
+
+def _factors_changed(since):
+    emissions.invalidate()
+    # Again once committed: other processes may have reloaded the old rows
+    # in between
+    transaction.on_commit(emissions.invalidate)
+    recompute_emissions.enqueue(since.isoformat())
+
+
+@receiver(pre_save, sender=EmissionFactorVersion)
+def factors_saving(sender, instance, raw=False, **kwargs):
+    # Moving effective_from later must also re-price the days it stops covering
+    instance._previous_effective_from = (
+        sender.objects.filter(pk=instance.pk).values_list("effective_from", flat=True).first()
+        if instance.pk and not raw else None
+    )
+
+
+@receiver(post_save, sender=EmissionFactorVersion)
+def factors_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_effective_from", None)
+    _factors_changed(min(d for d in (instance.effective_from, previous) if d))
+
+
+@receiver(post_delete, sender=EmissionFactorVersion)
+def factors_deleted(sender, instance, **kwargs):
+    _factors_changed(instance.effective_from)
@@ -0,0 +1,122 @@
+"""
+Per-user context snapshot shared by the dashboard and EcoBot.
+
+A snapshot holds the user's leaderboard totals, rank, this week's CO₂ and
+latest log, read with one SQL statement (the profile row plus scalar
+subqueries) instead of the five separate queries each chat message used to
+run. Snapshots are cached in CACHES["default"] for USER_SNAPSHOT_TTL seconds
+under the user's dashboard version stamp, so any ActivityLog write (which
+replaces the stamp, see tracker.signals) makes the next read rebuild it. Rank
+and user count also move with other users' activity; the TTL bounds that
+staleness. Snapshots are always built from the primary, even inside a
+@replica_reads view, so a lagging replica can't be cached under a fresh stamp.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import dashboard_cache, metrics
+from .db_router import primary_reads
+from .models import ActivityLog, CarbonFootprint, UserProfile
+from .rollups import week_start
+
+
+@dataclass(frozen=True, slots=True)
+class UserContextSnapshot:
+    user_id: int
+    has_profile: bool
+    total_co2: float
+    log_count: int
+    score: float
+    rank: int            # None without a leaderboard profile
+    total_users: int
+    week_co2: float
+    latest_date: date    # None (and the counts below too) before the first log
+    latest_emails: int
+    latest_drive_gb: float
+    latest_commits: int
+
+
+def _count(queryset):
+    # COUNT(*) as a scalar subquery (no GROUP BY on the outer query)
+    return Subquery(
+        queryset.order_by().annotate(n=Func("id", function="COUNT", output_field=IntegerField())).values("n")
+    )
+
+
+def _latest(field):
+    return Subquery(ActivityLog.objects.filter(user_id=OuterRef("user_id")).order_by("-date").values(field)[:1])
+
+
+def query(user_id, today):
+    """
+    The combined query behind build(), as a values() queryset. It reads
+    from the profile (no row before the first log), so it can be routed to
+    the read replica like the other tracker reads.
+    """
+    return (
+        UserProfile.objects.filter(user_id=user_id)
+        .annotate(
+            profile_id=F("id"),
+            ahead=_count(UserProfile.objects.filter(
+                Q(total_co2__lt=OuterRef("total_co2"))
+                | Q(total_co2=OuterRef("total_co2"), id__lt=OuterRef("id"))
+            )),
+            total_users=_count(UserProfile.objects.all()),
+            week_co2=Subquery(
+                CarbonFootprint.objects.filter(user_id=OuterRef("user_id"), week_start=week_start(today))
+                .annotate(total=F("co2_emails") + F("co2_drive") + F("co2_github"))
+                .values("total")[:1]
+            ),
+            latest_date=_latest("date"),
+            latest_emails=_latest("emails_sent"),
+            latest_drive_gb=_latest("drive_storage_gb"),
+            latest_commits=_latest("github_commits"),
+        )
+        .values(
+            "profile_id", "total_co2", "log_count", "score", "ahead", "total_users", "week_co2",
+            "latest_date", "latest_emails", "latest_drive_gb", "latest_commits",
+        )
+    )
+
+
+def build(user_id, today=None):
+    """Reads a fresh snapshot from the database (one query)."""
+    row = query(user_id, today or timezone.now().date()).first() or {}
+    has_profile = row.get("profile_id") is not None
+    return UserContextSnapshot(
+        user_id=user_id,
+        has_profile=has_profile,
+        total_co2=row.get("total_co2") or 0.0,
+        log_count=row.get("log_count") or 0,
+        score=row.get("score") or 0.0,
+        rank=row["ahead"] + 1 if has_profile else None,
+        total_users=row.get("total_users") or 0,
+        week_co2=row.get("week_co2") or 0.0,
+        latest_date=row.get("latest_date"),
+        latest_emails=row.get("latest_emails"),
+        latest_drive_gb=row.get("latest_drive_gb"),
+        latest_commits=row.get("latest_commits"),
+    )
+
+
+def _key(user_id, today):
+    return f"snapshot:{user_id}:{dashboard_cache.version(user_id)}:{today.isoformat()}"
+
+
+def get(user_id, today=None):
+    """The user's snapshot, from the cache when it's recent enough."""
+    today = today or timezone.now().date()
+    key = _key(user_id, today)
+    snapshot = cache.get(key)
+    metrics.CACHE_LOOKUPS.inc(cache="snapshot", result="miss" if snapshot is None else "hit")
+    if snapshot is None:
+        with primary_reads():
+            snapshot = build(user_id, today)
+        cache.set(key, snapshot, settings.USER_SNAPSHOT_TTL)
+    return snapshot
+
@@ -0,0 +1,146 @@
+"""
+Database-backed task queue.
+
+Expensive recomputations are registered with @task and queued with
+fn.enqueue(*args) instead of running on the request path. The job is a
+Task row written in the caller's transaction, so it only becomes visible
+(and runnable) if that transaction commits. `manage.py run_worker` claims
+and runs due jobs; no broker is needed beyond the app's own database.
+
+- Identical pending jobs (same name and args) collapse into one row.
+- A failing job is retried up to max_attempts times with exponential
+  backoff (TASK_RETRY_DELAY, doubled per attempt), then kept as failed.
+- A job left running longer than TASK_TIMEOUT (e.g. its worker was killed)
+  goes back to pending.
+
+With TASKS_RUN_EAGERLY the job runs in-process right after commit instead,
+for development and tests without a worker.
+"""
+import hashlib
+import json
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+_registry = {}
+
+
+def task(name=None, max_attempts=3):
+    """Registers fn as a task and gives it an .enqueue(*args) method. Args must be JSON-serialisable."""
+    def register(fn):
+        task_name = name or f"{fn.__module__}.{fn.__name__}"
+        _registry[task_name] = (fn, max_attempts)
+        fn.task_name = task_name
+        fn.enqueue = lambda *args: enqueue(task_name, *args)
+        return fn
+    return register
+
+
+def _dedup_key(name, args):
+    return hashlib.sha1(json.dumps([name, args], sort_keys=True).encode()).hexdigest()
+
+
+def enqueue(name, *args):
+    """Queues task `name` unless an identical job is already pending."""
+    fn, max_attempts = _registry[name]
+    args = list(args)
+    if settings.TASKS_RUN_EAGERLY:
+        transaction.on_commit(lambda: fn(*args))
+        return
+    key = _dedup_key(name, args)
+    try:
+        with transaction.atomic():
+            Task.objects.get_or_create(dedup_key=key, defaults={
+                "name": name, "args": args, "max_attempts": max_attempts,
+            })
+    except IntegrityError:
+        # Queued concurrently by another request
+        pass
+
+
+# --- Worker side ---
+
+def requeue_stale():
+    """Puts jobs whose worker vanished mid-run back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_TIMEOUT)
+    return Task.objects.filter(status=Task.RUNNING, updated_at__lt=cutoff).update(
+        status=Task.PENDING, updated_at=timezone.now(),
+    )
+
+
+def claim(limit):
+    """
+    Marks up to `limit` due jobs as running and returns them. Each claim is
+    a conditional UPDATE, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    due = list(
+        Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+        .order_by("run_after", "id").values_list("id", flat=True)[:limit]
+    )
+    claimed = [
+        task_id for task_id in due
+        if Task.objects.filter(id=task_id, status=Task.PENDING).update(
+            status=Task.RUNNING, dedup_key=None, attempts=F("attempts") + 1, updated_at=now,
+        )
+    ]
+    return list(Task.objects.filter(id__in=claimed).order_by("run_after", "id"))
+
+
+def execute(job):
+    """Runs one claimed job, then deletes it or schedules its retry."""
+    entry = _registry.get(job.name)
+    try:
+        if entry is None:
+            raise LookupError(f"Unknown task {job.name!r}")
+        entry[0](*job.args)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if entry is not None and job.attempts < job.max_attempts:
+            # The retry stays out of dedup so it can't clash with a newer
+            # identical job queued while this one was running
+            job.status = Task.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.TASK_RETRY_DELAY * 2 ** (job.attempts - 1),
+            )
+        else:
+            job.status = Task.FAILED
+        job.save(update_fields=["status", "run_after", "last_error", "updated_at"])
+        return False
+    job.delete()
+    return True
+
+
+def run_pending(limit=10):
+    """Claims and runs one batch of due jobs. Returns how many ran."""
+    jobs = claim(limit)
+    for job in jobs:
+        execute(job)
+    return len(jobs)
+
+
+def work(batch_size=10, once=False, should_stop=lambda: False):
+    """
+    Worker loop: runs due jobs until should_stop() (or, with once=True,
+    until the queue is empty), polling every TASK_POLL_INTERVAL seconds.
+    """
+    last_sweep = 0
+    while not should_stop():
+        # A long-lived worker has no request cycle, so apply CONN_MAX_AGE
+        # and the connection health checks here
+        close_old_connections()
+        if time.monotonic() - last_sweep > settings.TASK_TIMEOUT / 2:
+            requeue_stale()
+            last_sweep = time.monotonic()
+        if run_pending(batch_size):
+            continue
+        if once:
+            return
+        time.sleep(settings.TASK_POLL_INTERVAL)
@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import json
+import math
+import re
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from cachetools import TTLCache
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    activity, badges, chat_pool, connectors, conversation, dashboard_cache, db_router, export, forecast,
+    gemini_chatbot, history, ingest, leaderboard, metrics, middleware, rollups, snapshot, taskqueue,
+)
+from .connectors import fakes
+from .models import (
+    CO2_COMMIT, CO2_DRIVE, CO2_EMAIL, ActivityLog, Badge, CarbonFootprint, DailyFootprint, EmissionFactorVersion,
+    SyncCursor, Task, UserBadge, UserProfile,
+)
+from .providers import chat_model
+
+DAY = date(2026, 3, 4)   # a Wednesday
+
+
+def aggregates(user):
+    """A user's profile, daily and weekly rollups, rounded for comparison."""
+    profile = UserProfile.objects.filter(user=user).values_list("total_co2", "log_count", "score").first()
+    daily = DailyFootprint.objects.filter(user=user).order_by("date").values_list(
+        "date", "emails_sent", "drive_storage_gb", "github_commits", "co2", "log_count",
+    )
+    weekly = CarbonFootprint.objects.filter(user=user).order_by("week_start").values_list(
+        "week_start", "co2_emails", "co2_drive", "co2_github",
+    )
+    rounded = lambda row: tuple(round(v, 9) if isinstance(v, float) else v for v in row)
+    return {
+        "profile": rounded(profile) if profile else None,
+        "daily": [rounded(row) for row in daily],
+        "weekly": [rounded(row) for row in weekly],
+    }
+
+
+@override_settings(TASKS_RUN_EAGERLY=False)
+class AggregateTests(TestCase):
+    """The signal-maintained totals must match a rebuild from ActivityLog."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice")
+
+    def assertMatchesRebuild(self):
+        incremental = aggregates(self.user)
+        leaderboard.recompute_profile(self.user.id)
+        rollups.rebuild(user_ids=[self.user.id])
+        self.assertEqual(incremental, aggregates(self.user))
+        return incremental
+
+    def log(self, day, emails=10, drive=0.5, commits=2):
+        return ActivityLog.objects.create(
+            user=self.user, date=day, emails_sent=emails, drive_storage_gb=drive, github_commits=commits,
+        )
+
+    def test_create(self):
+        self.log(DAY)
+        self.log(DAY + timedelta(days=1), emails=3)
+        self.log(DAY + timedelta(days=7), drive=2.0)
+        totals = self.assertMatchesRebuild()
+        self.assertEqual(totals["profile"][1], 3)
+        self.assertEqual(len(totals["daily"]), 3)
+        self.assertEqual(len(totals["weekly"]), 2)
+
+    def test_edit(self):
+        log = self.log(DAY)
+        self.log(DAY + timedelta(days=1))
+        log.emails_sent = 500
+        log.save()
+        # Edits are rebuilt on the task queue
+        taskqueue.run_pending()
+        totals = self.assertMatchesRebuild()
+        self.assertEqual(totals["daily"][0][1], 500)
+
+    def test_delete(self):
+        log = self.log(DAY)
+        self.log(DAY + timedelta(days=1))
+        self.log(DAY + timedelta(days=8))
+        log.delete()
+        totals = self.assertMatchesRebuild()
+        self.assertEqual(totals["profile"][1], 2)
+        self.assertEqual([row[0] for row in totals["daily"]], [DAY + timedelta(days=1), DAY + timedelta(days=8)])
+
+    def test_delete_user(self):
+        self.log(DAY)
+        self.user.delete()
+        self.assertFalse(UserProfile.objects.exists())
+        self.assertFalse(DailyFootprint.objects.exists())
+
+    def test_bulk_import(self):
+        self.log(DAY, emails=1)
+        result = ingest.import_rows([
+            {"username": "alice", "date": day.isoformat(), "emails_sent": emails,
+             "drive_storage_gb": 0.25, "github_commits": 1}
+            for day, emails in [(DAY, 4), (DAY + timedelta(days=1), 3), (DAY + timedelta(days=1), 7)]
+        ])
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+        totals = self.assertMatchesRebuild()
+        self.assertEqual([row[1] for row in totals["daily"]], [5, 10])
+
+
+@override_settings(TASKS_RUN_EAGERLY=False)
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.user = User.objects.create_user("alice")
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+
+    def log(self, days_ago, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            ActivityLog.objects.create(user=self.user, date=self.today - timedelta(days=days_ago), **fields)
+
+    def dashboard(self, period="all"):
+        response = self.client.get("/dashboard/", {"period": period})
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_totals_and_chart(self):
+        self.log(20, emails_sent=100)
+        self.log(3, drive_storage_gb=1.0)
+        self.log(0, emails_sent=10, github_commits=2)
+
+        stats = self.dashboard("all")
+        self.assertEqual(
+            (stats["total_co2"], stats["total_emails"], stats["total_drive"], stats["total_commits"]),
+            (1.54, 110, 1.0, 2),
+        )
+        self.assertEqual(stats["chart_labels"], [
+            (self.today - timedelta(days=n)).isoformat() for n in (20, 3, 0)
+        ])
+        self.assertEqual(stats["chart_data"], [0.4, 1.5, 1.54])
+        self.assertEqual((stats["daily_co2"], stats["daily_progress"]), (0.04, 4))
+        self.assertIsNotNone(stats["prediction"])
+
+        week = self.dashboard("week")
+        self.assertEqual((week["total_co2"], week["total_emails"], week["chart_data"]), (1.14, 10, [1.1, 1.14]))
+
+    def test_query_count_does_not_grow_with_history(self):
+        def count():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.dashboard("all")
+            return len(queries)
+
+        self.log(0, emails_sent=1)
+        few = count()
+        for days_ago in range(1, 40):
+            self.log(days_ago, emails_sent=days_ago)
+        self.assertEqual(count(), few)
+
+    def test_cache_is_dropped_after_a_log(self):
+        self.log(1, emails_sent=100)
+        self.assertEqual(self.dashboard()["total_emails"], 100)
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(self.dashboard()["total_emails"], 100)
+        self.assertFalse(any("tracker_dailyfootprint" in q["sql"] for q in cached.captured_queries))
+
+        self.log(0, emails_sent=5)
+        self.assertEqual(self.dashboard()["total_emails"], 105)
+
+    def test_cache_is_dropped_after_a_reset(self):
+        self.log(1, emails_sent=100)
+        self.assertEqual(self.dashboard()["total_emails"], 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/reset/")
+        stats = self.dashboard()
+        self.assertEqual((stats["total_co2"], stats["total_emails"], stats["chart_data"]), (0, 0, []))
+
+
+class RankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Lowest CO₂ ranks first; equal totals go by profile id
+        self.profiles = {
+            name: UserProfile.objects.create(user=User.objects.create_user(name), total_co2=co2)
+            for name, co2 in [("alice", 2.0), ("bob", 1.0), ("carol", 2.0), ("dave", 0.5)]
+        }
+
+    def test_rank_of(self):
+        ranks = {name: leaderboard.rank_of(profile) for name, profile in self.profiles.items()}
+        self.assertEqual(ranks, {"dave": 1, "bob": 2, "alice": 3, "carol": 4})
+        self.assertEqual(leaderboard.total_users(), 4)
+
+    def test_rank_is_one_count(self):
+        with self.assertNumQueries(1):
+            leaderboard.rank_of(self.profiles["carol"])
+
+    def test_dashboard_and_chatbot_agree(self):
+        carol = self.profiles["carol"].user
+        self.client.force_login(carol)
+        session = self.client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+        self.assertEqual(self.client.get("/dashboard/").context["user_rank"], 4)
+        context = gemini_chatbot.user_context(carol)
+        self.assertEqual((context["rank"], context["total_users"]), (4, 4))
+
+    def test_user_without_profile(self):
+        erin = User.objects.create_user("erin")
+        self.assertEqual(gemini_chatbot.user_context(erin)["rank"], "N/A")
+        self.client.force_login(erin)
+        session = self.client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+        # The dashboard creates the empty profile, which ranks first
+        self.assertEqual(self.client.get("/dashboard/").context["user_rank"], 1)
+
+
+class ImportViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        User.objects.create_user("alice")
+
+    def upload(self, name, body, **data):
+        return self.client.post("/import/", {"file": SimpleUploadedFile(name, body.encode()), **data})
+
+    def test_imports_rows(self):
+        response = self.upload("rows.json", '[{"username": "alice", "date": "2026-03-04", "emails_sent": 2, '
+                                            '"drive_storage_gb": 0, "github_commits": 1}]')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
+
+    def test_bad_input_is_a_400(self):
+        csv_rows = "username,date,emails_sent,drive_storage_gb,github_commits\nalice,2026-03-04,1,0,0\n"
+        for name, body, data in [
+            ("rows.csv", csv_rows, {"batch_size": "x"}),
+            ("rows.csv", csv_rows, {"batch_size": "0"}),
+            ("rows.json", '{"a": 1}', {}),
+            ("rows.json", "[[1, 2]]", {}),
+            ("rows.ndjson", "[1]\n", {}),
+            ("rows.json", "[{", {}),
+        ]:
+            with self.subTest(name=name, body=body, data=data):
+                self.assertEqual(self.upload(name, body, **data).status_code, 400)
+        self.assertFalse(ActivityLog.objects.exists())
+
+
+@override_settings(CHATBOT_BACKEND="stub", CHATBOT_STUB_DELAY=0)
+class ChatbotSessionTests(TestCase):
+    def chat(self):
+        return self.client.post("/chatbot/", '{"message": "How am I doing?"}', content_type="application/json")
+
+    def test_anonymous_chat_creates_no_session(self):
+        self.assertEqual(self.chat().status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn("sessionid", self.chat().cookies)
+
+    def test_logged_in_chat_is_remembered(self):
+        self.client.force_login(User.objects.create_user("alice"))
+        self.chat()
+        memory = conversation.Conversation.load(self.client.session.session_key)
+        self.assertEqual(len(memory.turns), 1)
+
+
+class CountingModel:
+    """Stand-in chat model that numbers its replies and can fail on demand."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        text = f"Reply {self.calls}."
+        if stream:
+            return iter([gemini_chatbot.StubModel.Response(word) for word in ("Reply ", f"{self.calls}.")])
+        return gemini_chatbot.StubModel.Response(text)
+
+
+class ChatModelTestCase(TestCase):
+    def setUp(self):
+        self.model = CountingModel()
+        self.enterContext(mock.patch.object(chat_model, "_value", self.model))
+        self.enterContext(mock.patch.object(chat_model, "_loaded", True))
+        self.clock = [0.0]
+        self.enterContext(mock.patch.object(
+            gemini_chatbot, "_cache", TTLCache(maxsize=16, ttl=600, timer=lambda: self.clock[0]),
+        ))
+        self.enterContext(mock.patch.dict(gemini_chatbot._stats, hits=0, misses=0, model_calls=0, model_seconds=0.0))
+
+
+class ChatbotCacheTests(ChatModelTestCase):
+    def test_repeated_anonymous_prompt_is_served_from_cache(self):
+        anonymous = AnonymousUser()
+        self.assertEqual(gemini_chatbot.ask_gemini(anonymous, "How am I doing?"), "Reply 1.")
+        self.assertEqual(gemini_chatbot.ask_gemini(anonymous, "  how am I   doing "), "Reply 1.")
+        self.assertEqual(self.model.calls, 1)
+        stats = gemini_chatbot.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["model_calls"]), (1, 1, 1))
+
+    def test_personal_replies_are_not_shared(self):
+        alice, bob = User.objects.create_user("alice"), User.objects.create_user("bob")
+        for user in (alice, bob):
+            ActivityLog.objects.create(user=user, date=DAY, emails_sent=10)
+        self.assertEqual(gemini_chatbot.ask_gemini(alice, "How am I doing?"), "Reply 1.")
+        self.assertEqual(gemini_chatbot.ask_gemini(bob, "How am I doing?"), "Reply 2.")
+        self.assertEqual(gemini_chatbot.ask_gemini(alice, "How am I doing?"), "Reply 1.")
+        self.assertEqual(self.model.calls, 2)
+
+    def test_cached_replies_expire(self):
+        gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?")
+        self.clock[0] += 601
+        self.assertEqual(gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?"), "Reply 2.")
+
+    def test_seconds_saved_ignores_fallbacks(self):
+        self.model.delay = 0.05
+        with mock.patch.object(chat_pool, "run", side_effect=chat_pool.ChatBusy):
+            self.assertEqual(gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?"), gemini_chatbot.BUSY_REPLY)
+        gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?")
+        gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?")
+
+        stats = gemini_chatbot.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["model_calls"]), (1, 2, 1))
+        self.assertEqual(stats["seconds_saved"], round(stats["model_seconds"], 3))
+        self.assertGreaterEqual(stats["seconds_saved"], 0.05)
+
+
+class ChatStreamTests(ChatModelTestCase):
+    def chat(self, accept="text/event-stream"):
+        return self.client.post(
+            "/chatbot/", '{"message": "Tips?"}', content_type="application/json", HTTP_ACCEPT=accept,
+        )
+
+    def events(self, response):
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        return b"".join(response.streaming_content).decode()
+
+    def test_tokens_are_sent_as_events(self):
+        self.assertEqual(self.events(self.chat()), (
+            'data: {"delta": "Reply "}\n\n'
+            'data: {"delta": "1."}\n\n'
+            'event: done\ndata: {}\n\n'
+        ))
+        # The finished reply is cached and replayed as one event
+        self.assertEqual(self.events(self.chat()), 'data: {"delta": "Reply 1."}\n\nevent: done\ndata: {}\n\n')
+        self.assertEqual(self.model.calls, 1)
+
+    def test_other_clients_get_json(self):
+        self.assertEqual(self.chat(accept="application/json").json(), {"reply": "Reply 1."})
+
+    def test_model_error_ends_the_stream_cleanly(self):
+        self.model.error = RuntimeError("quota exceeded")
+        body = self.events(self.chat())
+        self.assertEqual(body, (
+            f"data: {json.dumps({'delta': '⚠️ Gemini Error: quota exceeded'})}\n\n"
+            "event: done\ndata: {}\n\n"
+        ))
+        # Errors are not cached
+        self.model.error = None
+        self.assertIn('data: {"delta": "2."}', self.events(self.chat()))
+
+    def test_stream_stops_at_the_deadline(self):
+        def trickle():
+            while True:
+                time.sleep(0.01)
+                yield "."
+
+        pieces = []
+        started = time.monotonic()
+        with self.assertRaises(chat_pool.ChatTimeout):
+            for piece in chat_pool.stream(trickle, timeout=1, deadline=0.1):
+                pieces.append(piece)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertTrue(pieces)
+
+
+@override_settings(CHATBOT_MAX_WORKERS=1, CHATBOT_MAX_QUEUE=1, CHATBOT_TIMEOUT=0.05)
+class ChatPoolTests(ChatModelTestCase):
+    def setUp(self):
+        super().setUp()
+        # A pool of its own, sized by the settings above
+        self.enterContext(mock.patch.object(chat_pool, "_executor", None))
+        self.enterContext(mock.patch.object(chat_pool, "_slots", None))
+        self.addCleanup(lambda: chat_pool._executor and chat_pool._executor.shutdown(wait=False))
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def saturate(self):
+        # Callers give up after the timeout, but the calls keep their slots
+        for _ in range(2):
+            with self.assertRaises(chat_pool.ChatTimeout):
+                chat_pool.run(self.release.wait)
+
+    def test_run_returns_the_result(self):
+        self.assertEqual(chat_pool.run(lambda a, b: a * b, 6, 7), 42)
+
+    def test_full_pool_rejects_at_once(self):
+        self.saturate()
+        started = time.monotonic()
+        with self.assertRaises(chat_pool.ChatBusy):
+            chat_pool.run(lambda: None)
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_busy_fallback(self):
+        self.saturate()
+        response = self.client.post("/chatbot/", '{"message": "Tips?"}', content_type="application/json")
+        self.assertEqual(response.json(), {"reply": gemini_chatbot.BUSY_REPLY})
+        self.assertEqual(self.model.calls, 0)
+
+    def test_timeout_fallback_is_not_cached(self):
+        self.model.delay = 0.2
+        self.assertEqual(gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?"), gemini_chatbot.TIMEOUT_REPLY)
+        self.model.delay = 0.0
+        with override_settings(CHATBOT_TIMEOUT=5):
+            self.assertEqual(gemini_chatbot.ask_gemini(AnonymousUser(), "Tips?"), "Reply 2.")
+
+@override_settings(TASKS_RUN_EAGERLY=False)
+class SnapshotTests(ChatModelTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user("alice")
+        UserProfile.objects.create(user=User.objects.create_user("bob"), total_co2=0.1)
+        for days_ago, emails in [(7, 100), (1, 50), (0, 25)]:
+            self.log(days_ago, emails_sent=emails, github_commits=days_ago)
+
+    def log(self, days_ago, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            ActivityLog.objects.create(user=self.user, date=DAY - timedelta(days=days_ago), **fields)
+
+    def test_built_with_one_query(self):
+        with self.assertNumQueries(1):
+            context = snapshot.build(self.user.id, DAY)
+        self.assertEqual(
+            (context.has_profile, context.log_count, context.rank, context.total_users),
+            (True, 3, 2, 2),
+        )
+        self.assertAlmostEqual(context.total_co2, 175 * CO2_EMAIL + 8 * CO2_COMMIT)
+        # Tuesday and Wednesday: the rest is from last week
+        self.assertAlmostEqual(context.week_co2, 75 * CO2_EMAIL + CO2_COMMIT)
+        self.assertEqual(
+            (context.latest_date, context.latest_emails, context.latest_commits, context.latest_drive_gb),
+            (DAY, 25, 0, 0.0),
+        )
+
+    def test_user_without_profile(self):
+        carol = User.objects.create_user("carol")
+        with self.assertNumQueries(1):
+            context = snapshot.build(carol.id, DAY)
+        self.assertEqual((context.has_profile, context.rank, context.total_co2), (False, None, 0.0))
+        self.assertIsNone(context.latest_date)
+
+    def test_cached_until_the_next_write(self):
+        first = snapshot.get(self.user.id, DAY)
+        with self.assertNumQueries(0):
+            self.assertEqual(snapshot.get(self.user.id, DAY), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.record_day(self.user.id, DAY, emails_sent=10)
+        with self.assertNumQueries(1):
+            refreshed = snapshot.get(self.user.id, DAY)
+        self.assertEqual(refreshed.latest_emails, 35)
+        self.assertAlmostEqual(refreshed.total_co2, first.total_co2 + 10 * CO2_EMAIL)
+
+    def test_chat_session_builds_it_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(20):
+                gemini_chatbot.ask_gemini(self.user, f"Question {i}?")
+        self.assertEqual(self.model.calls, 20)
+        self.assertEqual(len(queries), 1)
+
+
+class RecordDayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice")
+
+    def test_second_entry_merges_into_the_day(self):
+        self.assertTrue(activity.record_day(self.user.id, DAY, emails_sent=10, github_commits=2))
+        self.assertFalse(activity.record_day(self.user.id, DAY, emails_sent=5, drive_storage_gb=1.5))
+
+        self.assertEqual(
+            list(ActivityLog.objects.filter(user=self.user).values_list("emails_sent", "drive_storage_gb", "github_commits")),
+            [(15, 1.5, 2)],
+        )
+        incremental = aggregates(self.user)
+        self.assertEqual(incremental["profile"][1], 1)
+        self.assertEqual(incremental["daily"][0][-1], 1)
+        leaderboard.recompute_profile(self.user.id)
+        rollups.rebuild(user_ids=[self.user.id])
+        self.assertEqual(incremental, aggregates(self.user))
+
+    def test_other_days_get_their_own_row(self):
+        activity.record_day(self.user.id, DAY, emails_sent=1)
+        activity.record_day(self.user.id, DAY + timedelta(days=1), emails_sent=1)
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 2)
+
+
+class CompactDuplicatesMigrationTests(TransactionTestCase):
+    before = [("tracker", "0012_sync_cursors")]
+    after = [("tracker", "0013_activitylog_one_row_per_day")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_summed(self):
+        User = self.apps.get_model("auth", "User")
+        ActivityLog = self.apps.get_model("tracker", "ActivityLog")
+        DailyFootprint = self.apps.get_model("tracker", "DailyFootprint")
+        UserProfile = self.apps.get_model("tracker", "UserProfile")
+        alice, bob = User.objects.create(username="alice"), User.objects.create(username="bob")
+        rows = [(alice, DAY, 1), (alice, DAY, 2), (alice, DAY + timedelta(days=1), 4),
+                (bob, DAY, 8), (bob, DAY, 16), (bob, DAY, 32)]
+        ids = [
+            ActivityLog.objects.create(user=user, date=day, emails_sent=emails, github_commits=1).id
+            for user, day, emails in rows
+        ]
+        DailyFootprint.objects.create(user=alice, date=DAY, emails_sent=3, log_count=2)
+        DailyFootprint.objects.create(user=bob, date=DAY, emails_sent=56, log_count=3)
+        UserProfile.objects.create(user=alice, total_co2=1.0, log_count=3, score=29.0)
+        UserProfile.objects.create(user=bob, total_co2=2.0, log_count=3, score=28.0)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        ActivityLog = apps.get_model("tracker", "ActivityLog")
+        DailyFootprint = apps.get_model("tracker", "DailyFootprint")
+        UserProfile = apps.get_model("tracker", "UserProfile")
+
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list("user__username", "date", "emails_sent", "github_commits")),
+            [("alice", DAY, 3, 2), ("alice", DAY + timedelta(days=1), 4, 1), ("bob", DAY, 56, 3)],
+        )
+        # The oldest row of each day is kept
+        self.assertEqual(ActivityLog.objects.get(user__username="alice", date=DAY).id, ids[0])
+        self.assertEqual(sorted(DailyFootprint.objects.values_list("log_count", flat=True)), [1, 1])
+        self.assertEqual(
+            sorted(UserProfile.objects.values_list("user__username", "log_count", "score", "total_co2")),
+            [("alice", 2, 19.0, 1.0), ("bob", 1, 8.0, 2.0)],
+        )
+
+
+@override_settings(TASKS_RUN_EAGERLY=False)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        # Created out of date order, interleaved between users
+        for user, days_after, emails in [
+            (self.alice, 2, 30), (self.bob, 0, 7), (self.alice, 0, 10),
+            (self.alice, 1, 20), (self.bob, 1, 8), (self.alice, 3, 40), (self.alice, 4, 50),
+        ]:
+            ActivityLog.objects.create(
+                user=user, date=DAY + timedelta(days=days_after),
+                emails_sent=emails, drive_storage_gb=0.5, github_commits=4,
+            )
+
+    def export(self, queryset, chunk_size):
+        return [(r["username"], r["date"], r["emails_sent"]) for r in export.rows(queryset, chunk_size)]
+
+    def test_user_chunks_follow_dates(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.export(export.queryset_for(self.alice), chunk_size=2)
+        self.assertEqual(rows, [
+            ("alice", (DAY + timedelta(days=n)).isoformat(), 10 * (n + 1)) for n in range(5)
+        ])
+        # Three chunks, then the empty one that ends the export; no OFFSET
+        self.assertEqual(len(queries), 4)
+        self.assertTrue(all("LIMIT 2" in q["sql"] and "OFFSET" not in q["sql"] for q in queries.captured_queries))
+
+    def test_all_users_chunks_follow_ids(self):
+        expected = list(ActivityLog.objects.order_by("id").values_list("user__username", "emails_sent"))
+        for chunk_size in (1, 3, 7, 100):
+            with self.subTest(chunk_size=chunk_size):
+                rows = self.export(export.queryset_for(), chunk_size)
+                self.assertEqual([(name, emails) for name, _, emails in rows], expected)
+
+    def test_co2_columns_use_the_factors_of_each_date(self):
+        EmissionFactorVersion.objects.create(effective_from=DAY + timedelta(days=1), co2_per_email=0.01)
+        first, second = list(export.rows(export.queryset_for(self.bob)))
+        self.assertEqual(
+            [first[c] for c in ("co2_emails", "co2_drive", "co2_github", "co2_total")],
+            [round(7 * CO2_EMAIL, 6), round(0.5 * CO2_DRIVE, 6), round(4 * CO2_COMMIT, 6),
+             round(7 * CO2_EMAIL + 0.5 * CO2_DRIVE + 4 * CO2_COMMIT, 6)],
+        )
+        self.assertEqual(second["co2_emails"], 0.08)
+        self.assertEqual(second["co2_total"], round(0.08 + 0.5 * CO2_DRIVE + 4 * CO2_COMMIT, 6))
+
+    def test_view_formats_and_scope(self):
+        self.client.force_login(self.bob)
+        response = self.client.get("/export/")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="activity-bob.csv"')
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(","), export.COLUMNS)
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get("/export/", {"format": "ndjson"})
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r["emails_sent"] for r in records], [7, 8])
+
+        self.assertEqual(self.client.get("/export/", {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/export/", {"scope": "all"}).status_code, 403)
+
+    def test_command(self):
+        out = StringIO()
+        with mock.patch("sys.stdout", out):
+            call_command("export_activity", "--user", "alice", "--format", "ndjson", "--chunk-size", "2")
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        with self.assertRaises(CommandError):
+            call_command("export_activity", "--user", "nobody")
+
+@override_settings(TASKS_RUN_EAGERLY=True)
+class EmissionFactorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        with self.captureOnCommitCallbacks(execute=True):
+            for user, day in [(self.alice, DAY - timedelta(days=7)), (self.alice, DAY + timedelta(days=1)),
+                              (self.bob, DAY - timedelta(days=7))]:
+                ActivityLog.objects.create(user=user, date=day, emails_sent=100, drive_storage_gb=1.0)
+
+    def change(self, action):
+        # The recompute job runs once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return action()
+
+    def daily_co2(self, user):
+        return dict(DailyFootprint.objects.filter(user=user).values_list("date", "co2"))
+
+    def assertMatchesRebuild(self, user):
+        recomputed = aggregates(user)
+        leaderboard.recompute_profile(user.id)
+        rollups.rebuild(user_ids=[user.id])
+        self.assertEqual(recomputed, aggregates(user))
+
+    def test_new_version_reprices_later_days_only(self):
+        old = 100 * CO2_EMAIL + CO2_DRIVE
+        self.change(lambda: EmissionFactorVersion.objects.create(effective_from=DAY, co2_per_email=0.01))
+
+        self.assertEqual(self.daily_co2(self.alice), {
+            DAY - timedelta(days=7): old,
+            DAY + timedelta(days=1): 100 * 0.01 + CO2_DRIVE,
+        })
+        self.assertAlmostEqual(UserProfile.objects.get(user=self.alice).total_co2, old + 1.0 + CO2_DRIVE)
+        week = CarbonFootprint.objects.get(user=self.alice, week_start=rollups.week_start(DAY))
+        self.assertAlmostEqual(week.co2_emails, 1.0)
+        self.assertMatchesRebuild(self.alice)
+        self.assertMatchesRebuild(self.bob)
+
+    def test_moving_and_deleting_a_version(self):
+        version = self.change(
+            lambda: EmissionFactorVersion.objects.create(effective_from=DAY - timedelta(days=7), co2_per_gb=2.0)
+        )
+        self.assertEqual(self.daily_co2(self.bob), {DAY - timedelta(days=7): 100 * CO2_EMAIL + 2.0})
+
+        # Moved past bob's log, which goes back to the baseline factors
+        version.effective_from = DAY
+        self.change(version.save)
+        self.assertEqual(self.daily_co2(self.bob), {DAY - timedelta(days=7): 100 * CO2_EMAIL + CO2_DRIVE})
+        self.assertEqual(self.daily_co2(self.alice)[DAY + timedelta(days=1)], 100 * CO2_EMAIL + 2.0)
+
+        self.change(version.delete)
+        self.assertEqual(self.daily_co2(self.alice)[DAY + timedelta(days=1)], 100 * CO2_EMAIL + CO2_DRIVE)
+        self.assertMatchesRebuild(self.alice)
+
+    def test_cached_totals_are_dropped(self):
+        self.client.force_login(self.alice)
+        session = self.client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+        before = self.client.get("/dashboard/", {"period": "all"}).context["total_co2"]
+        bob_version = dashboard_cache.version(self.bob.id)
+
+        self.change(lambda: EmissionFactorVersion.objects.create(effective_from=DAY, co2_per_gb=3.0))
+        after = self.client.get("/dashboard/", {"period": "all"}).context["total_co2"]
+        self.assertAlmostEqual(after, round(before - CO2_DRIVE + 3.0, 2))
+        self.assertEqual(snapshot.get(self.alice.id).total_co2, UserProfile.objects.get(user=self.alice).total_co2)
+        # Users with nothing on or after the change keep their cache
+        self.assertEqual(dashboard_cache.version(self.bob.id), bob_version)
+
+
+class HistoryPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice")
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, date=DAY - timedelta(days=i), emails_sent=i) for i in range(25)
+        ])
+        self.logs = ActivityLog.objects.filter(user=self.user)
+
+    def walk(self, limit, **kwargs):
+        pages, after = [], None
+        while True:
+            result = history.page(self.logs, after=after, limit=limit, **kwargs)
+            pages.append(result["results"])
+            if not result["next"]:
+                return pages
+            after = history.decode_cursor(result["next"])
+
+    def test_pages_cover_history_newest_first(self):
+        pages = self.walk(10)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(
+            [r["id"] for p in pages for r in p],
+            list(self.logs.order_by("-date").values_list("id", flat=True)),
+        )
+
+    def test_exact_multiple_has_no_empty_page(self):
+        self.assertEqual([len(p) for p in self.walk(5)], [5] * 5)
+
+    def test_cursor_is_stable_under_new_rows(self):
+        first = history.page(self.logs, limit=10)
+        ActivityLog.objects.create(user=self.user, date=DAY + timedelta(days=1))
+        second = history.page(self.logs, after=history.decode_cursor(first["next"]), limit=10)
+        self.assertEqual(second["results"][0]["date"], (DAY - timedelta(days=10)).isoformat())
+
+    def test_fields_and_co2(self):
+        log = self.logs.get(date=DAY - timedelta(days=3))
+        record = history.page(self.logs.filter(id=log.id), fields=["date", "co2"])["results"][0]
+        self.assertEqual(record, {"date": log.date.isoformat(), "co2": round(log.co2, 6)})
+
+    def test_bad_cursor(self):
+        with self.assertRaises(ValueError):
+            history.decode_cursor("not-a-cursor")
+        day, pk = history.decode_cursor(history.encode_cursor(DAY, 42))
+        self.assertEqual((day, pk), (DAY, 42))
+
+
+calls = []
+
+
+@taskqueue.task("tests.record", max_attempts=2)
+def record_call(value):
+    calls.append(value)
+
+
+@taskqueue.task("tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@override_settings(TASKS_RUN_EAGERLY=False, TASK_RETRY_DELAY=30, TASK_TIMEOUT=600)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_identical_pending_jobs_collapse(self):
+        record_call.enqueue(1)
+        record_call.enqueue(1)
+        record_call.enqueue(2)
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(taskqueue.run_pending(), 2)
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claimed_job_is_not_claimed_again(self):
+        record_call.enqueue(1)
+        (job,) = taskqueue.claim(10)
+        self.assertEqual((job.status, job.attempts, job.dedup_key), (Task.RUNNING, 1, None))
+        self.assertEqual(taskqueue.claim(10), [])
+        # A new identical job may queue while the first one runs
+        record_call.enqueue(1)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_failure_is_retried_with_backoff_then_kept(self):
+        fail.enqueue()
+        self.assertEqual(taskqueue.run_pending(), 1)
+        job = Task.objects.get()
+        self.assertEqual((job.status, job.attempts), (Task.PENDING, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+        # Not due yet
+        self.assertEqual(taskqueue.run_pending(), 0)
+
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(taskqueue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.FAILED, 2))
+        self.assertEqual(taskqueue.run_pending(), 0)
+
+    def test_stale_running_job_is_requeued(self):
+        record_call.enqueue(1)
+        taskqueue.claim(10)
+        self.assertEqual(taskqueue.requeue_stale(), 0)
+        Task.objects.update(updated_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(taskqueue.requeue_stale(), 1)
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, [1])
+
+    @override_settings(TASKS_RUN_EAGERLY=True)
+    def test_eager_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_call.enqueue(1)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_RUN_EAGERLY=False)
+class BadgeTests(TestCase):
+    LIGHT = {"emails_sent": 10}          # 0.04 kg, under the daily goal
+    HEAVY = {"drive_storage_gb": 1.0}    # 1.1 kg, over it
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice")
+
+    def log(self, days, **fields):
+        for day in days:
+            ActivityLog.objects.create(user=self.user, date=day, **(fields or self.LIGHT))
+
+    def awarded(self):
+        badges.evaluate([self.user.id])
+        return set(UserBadge.objects.filter(user=self.user).values_list("badge__code", flat=True))
+
+    def test_ten_logs(self):
+        self.log(DAY - timedelta(days=2 * i) for i in range(9))
+        self.assertNotIn("ten-logs", self.awarded())
+        self.log([DAY + timedelta(days=2)])
+        self.assertIn("ten-logs", self.awarded())
+
+    def test_streak(self):
+        self.log(DAY + timedelta(days=i) for i in range(6))
+        self.log([DAY + timedelta(days=7)])   # one day missed
+        self.assertNotIn("streak-7", self.awarded())
+        self.log([DAY + timedelta(days=6)])
+        self.assertIn("streak-7", self.awarded())
+        self.assertNotIn("streak-30", self.awarded())
+
+    def test_under_goal(self):
+        self.log([DAY, DAY + timedelta(days=1), DAY + timedelta(days=3)])
+        self.log([DAY + timedelta(days=2)], **self.HEAVY)
+        self.assertNotIn("under-goal-3", self.awarded())
+        self.log([DAY + timedelta(days=4), DAY + timedelta(days=5)])
+        self.assertIn("under-goal-3", self.awarded())
+
+    def test_reductions(self):
+        monday = DAY - timedelta(days=DAY.weekday())
+        # Weekly totals of 4, 3, 3, 2 and 1 GB: the last two weeks keep falling
+        for week, gigabytes in enumerate([4, 3, 3, 2, 1]):
+            self.log([monday + timedelta(weeks=week)], drive_storage_gb=gigabytes)
+        awarded = self.awarded()
+        self.assertIn("reduction-1", awarded)
+        self.assertNotIn("reduction-3", awarded)
+        self.log([monday + timedelta(weeks=5)], drive_storage_gb=0.5)
+        self.assertIn("reduction-3", self.awarded())
+
+    def test_recreated_badges_are_picked_up(self):
+        self.log([DAY])
+        self.assertEqual(self.awarded(), {"first-log"})
+        Badge.objects.all().delete()
+        self.assertEqual(self.awarded(), {"first-log"})
+
+    def test_badges_page_queries(self):
+        self.log(DAY + timedelta(days=i) for i in range(7))
+        self.awarded()
+        self.client.force_login(self.user)
+        # Session, user and the awards with their badges
+        with self.assertNumQueries(3):
+            response = self.client.get("/badges/")
+        self.assertContains(response, "Week Streak")
+
+
+@override_settings(
+    SYNC_BACKFILL_DAYS=10, SYNC_MAX_RETRIES=3, TASKS_RUN_EAGERLY=False,
+    SYNC_RATE_LIMITS={"gmail": 1000.0, "drive": 1000.0, "github": 1000.0},
+)
+class ConnectorSyncTests(TestCase):
+    """connectors.sync() end to end against the fake APIs in tracker.connectors.fakes."""
+
+    SOURCES = list(connectors.CONNECTORS)
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f"user{i}") for i in range(3)]
+        self.ids = [user.id for user in self.users]
+        self.today = timezone.localdate()
+        self.server = fakes.FakeAPIServer(today=self.today).start()
+        self.addCleanup(self.server.stop)
+
+    def sync(self, sources=SOURCES, user_ids=None, max_workers=4):
+        return connectors.sync(
+            sources, accounts=fakes.accounts_for(user_ids or self.ids, sources),
+            base_urls=self.server.base_urls(), max_workers=max_workers,
+        )
+
+    def expected_commits(self, user_id, day):
+        login = f"fake-user-{user_id}"
+        events = self.server.github_events(login)
+        return sum(
+            e["payload"]["size"] for e in events
+            if e["type"] == "PushEvent" and e["created_at"].startswith(day.isoformat())
+        )
+
+    def test_first_sync_stores_the_fake_figures(self):
+        report = self.sync()
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.accounts, 9)
+
+        user_id = self.ids[0]
+        logs = {log.date: log for log in ActivityLog.objects.filter(user_id=user_id)}
+        for offset in range(10):
+            day = self.today - timedelta(days=offset)
+            emails = self.server.gmail_sent(f"fake-token-{user_id}", day)
+            commits = self.expected_commits(user_id, day)
+            log = logs.get(day)
+            self.assertEqual((log.emails_sent, log.github_commits) if log else (0, 0), (emails, commits), day)
+        drive = round(self.server.drive_bytes(f"fake-token-{user_id}") / 1024 ** 3, 3)
+        self.assertEqual(logs[self.today].drive_storage_gb, drive)
+        self.assertEqual(SyncCursor.objects.filter(last_synced=self.today).count(), 9)
+
+        # The bulk writes kept the aggregates in step
+        before = aggregates(self.users[0])
+        leaderboard.recompute_profile(user_id)
+        rollups.rebuild(user_ids=[user_id])
+        self.assertEqual(before, aggregates(self.users[0]))
+
+    def test_second_sync_fetches_only_the_delta(self):
+        self.sync()
+        requests = self.server.counts["requests"]
+        report = self.sync()
+        self.assertEqual(report.errors, [])
+        # One Gmail day, one Drive call and one (not modified) GitHub page per user
+        self.assertEqual(self.server.counts["requests"] - requests, 9)
+        self.assertEqual(self.server.counts["not_modified"], 3)
+        self.assertEqual(report.created, 0)
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.fail_every = 4
+        # One worker, so each retry is the very next request and goes through;
+        # with several, other threads' requests can push one past the retry limit
+        report = self.sync(max_workers=1)
+        self.assertEqual(report.errors, [])
+        self.assertGreater(self.server.counts["failed"], 0)
+
+    def test_failed_fetch_keeps_its_cursor(self):
+        self.sync(["gmail"])
+        earlier = self.today - timedelta(days=3)
+        SyncCursor.objects.update(last_synced=earlier)
+        self.server.fail_every = 1
+        with self.assertLogs("tracker.connectors.sync", "WARNING"):
+            report = self.sync(["gmail"], user_ids=self.ids[:1])
+        self.assertEqual(len(report.errors), 1)
+        cursor = SyncCursor.objects.get(user_id=self.ids[0], source="gmail")
+        self.assertEqual(cursor.last_synced, earlier)
+        self.assertIn("429", cursor.last_error)
+
+    def test_command_rolls_back_fake_runs(self):
+        out = StringIO()
+        call_command("sync_activity", "--fake", "--user", str(self.ids[0]), stdout=out)
+        self.assertIn('"error_count": 0', out.getvalue())
+        self.assertFalse(ActivityLog.objects.exists())
+        call_command("sync_activity", "--fake", "--keep", "--user", str(self.ids[0]), stdout=StringIO())
+        self.assertTrue(ActivityLog.objects.filter(user_id=self.ids[0]).exists())
+
+
+@override_settings(REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        self.enterContext(mock.patch("tracker.db_router.replica_configured", return_value=True))
+
+    def middleware(self, view, session, write=False):
+        """Runs `view` through ReplicaMiddleware; returns the alias ActivityLog reads went to."""
+        routed = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            routed.append(self.router.db_for_read(ActivityLog))
+            if write:
+                self.router.db_for_write(ActivityLog)
+            return None
+
+        middleware = db_router.ReplicaMiddleware(get_response)
+        request = RequestFactory().get("/")
+        request.session = session
+        middleware(request)
+        return routed[0]
+
+    def test_reads_stay_on_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(ActivityLog), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(ActivityLog), DEFAULT_DB_ALIAS)
+
+    def test_marked_view_reads_tracker_models_from_replica(self):
+        view = db_router.replica_reads(lambda request: None)
+        self.assertEqual(self.middleware(view, {}), db_router.REPLICA)
+        self.assertEqual(self.middleware(lambda request: None, {}), DEFAULT_DB_ALIAS)
+
+        token = db_router._use_replica.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(UserProfile), db_router.REPLICA)
+            self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(Session), DEFAULT_DB_ALIAS)
+            with db_router.primary_reads():
+                self.assertEqual(self.router.db_for_read(ActivityLog), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(ActivityLog), db_router.REPLICA)
+        finally:
+            db_router._use_replica.reset(token)
+        # Nothing leaks out of the request
+        self.assertEqual(self.router.db_for_read(ActivityLog), DEFAULT_DB_ALIAS)
+
+    def test_writing_session_is_pinned_until_expiry(self):
+        view = db_router.replica_reads(lambda request: None)
+        session = {}
+        self.assertEqual(self.middleware(view, session, write=True), db_router.REPLICA)
+        self.assertAlmostEqual(session[db_router.PIN_SESSION_KEY], timezone.now().timestamp() + 5, delta=1)
+
+        self.assertEqual(self.middleware(view, session), DEFAULT_DB_ALIAS)
+        with mock.patch("time.time", return_value=session[db_router.PIN_SESSION_KEY] + 1):
+            self.assertEqual(self.middleware(view, session), db_router.REPLICA)
+        # Other sessions were never pinned
+        self.assertEqual(self.middleware(view, {}), db_router.REPLICA)
+
+    def test_middleware_unused_without_replica(self):
+        with mock.patch("tracker.db_router.replica_configured", return_value=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                db_router.ReplicaMiddleware(lambda request: None)
+
+    def test_cached_dashboard_numbers_are_read_from_primary(self):
+        cache.clear()
+        user = User.objects.create_user("alice")
+        ActivityLog.objects.create(user=user, date=timezone.now().date(), emails_sent=5)
+        routed = []
+        route = db_router.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append((model._meta.label, route(router, model, **hints)))
+            return DEFAULT_DB_ALIAS   # the test database has no replica
+
+        self.client.force_login(user)
+        session = self.client.session
+        session["can_visit_dashboard"] = True
+        session.save()
+        with mock.patch.object(db_router.ReplicaRouter, "db_for_read", record):
+            self.assertEqual(self.client.get("/dashboard/").status_code, 200)
+        self.assertIn(("tracker.UserProfile", DEFAULT_DB_ALIAS), routed)
+        self.assertNotIn(db_router.REPLICA, {alias for _, alias in routed})
+
+
+def sklearn_forecast(values):
+    """What the dashboard computed before tracker.forecast (None under MIN_POINTS)."""
+    from sklearn.linear_model import LinearRegression
+
+    if len(values) < forecast.MIN_POINTS:
+        return None
+    model = LinearRegression().fit([[i] for i in range(len(values))], values)
+    return float(model.predict([[len(values) + forecast.HORIZON]])[0])
+
+
+class ForecastTests(TestCase):
+    SERIES = [
+        [],
+        [1.5],
+        [1.5, 2.0],
+        [1.0, 2.0, 2.5],
+        [0.2, 0.2, 0.2, 0.2],
+        [0.04, 1.1, 1.1, 2.3, 2.31, 2.9, 4.4, 4.45, 5.0, 6.12],
+        [round(0.37 * i + (i % 3) * 0.05, 2) for i in range(90)],
+    ]
+
+    def test_matches_sklearn(self):
+        for values in self.SERIES:
+            with self.subTest(points=len(values)):
+                expected = sklearn_forecast(values)
+                result = forecast.linear_forecast(values)
+                if expected is None:
+                    self.assertIsNone(result)
+                else:
+                    self.assertAlmostEqual(result.value, expected, places=9)
+                    self.assertLessEqual(result.lower, result.value)
+                    self.assertGreaterEqual(result.upper, result.value)
+
+    def test_batch_matches_sklearn(self):
+        batched = forecast.forecast_many(self.SERIES)
+        for values, value in zip(self.SERIES, batched):
+            with self.subTest(points=len(values)):
+                expected = sklearn_forecast(values)
+                if expected is None:
+                    self.assertTrue(math.isnan(value))
+                else:
+                    self.assertAlmostEqual(value, expected, places=9)
+        self.assertEqual(len(forecast.forecast_many([])), 0)
+        self.assertTrue(all(math.isnan(v) for v in forecast.forecast_many([[], [1.0, 2.0]])))
+
+    def test_exact_line_has_no_margin(self):
+        result = forecast.linear_forecast([1.0, 3.0, 5.0, 7.0], horizon=0)
+        self.assertEqual((result.lower, result.value, result.upper), (9.0, 9.0, 9.0))
+
+    def test_weekly_seasonality_follows_dates(self):
+        # Three weeks of logs with the weekends skipped; Fridays run 2 kg high
+        monday = DAY - timedelta(days=DAY.weekday())
+        dates = [monday + timedelta(weeks=w, days=d) for w in range(3) for d in range(5)]
+        values = [float(i) + (2.0 if day.weekday() == 4 else 0.0) for i, day in enumerate(dates)]
+        trend = forecast.linear_forecast(values, horizon=0)
+
+        # Next point falls on the day after the last Friday: a Saturday, never seen
+        self.assertAlmostEqual(forecast.linear_forecast(values, horizon=0, dates=dates).value, trend.value)
+        # Logged a week later instead, it lands on a Friday and gets the bump
+        friday = forecast.linear_forecast(values, horizon=6, dates=dates)
+        plain = forecast.linear_forecast(values, horizon=6)
+        self.assertGreater(friday.value - plain.value, 1.0)
+        # The weekday pattern is explained, so the interval narrows
+        self.assertLess(friday.upper - friday.value, plain.upper - plain.value)
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="", SLOW_REQUEST_MS=0)
+class MetricsTests(TestCase):
+    def setUp(self):
+        # Every metric starts empty and gets its earlier values back afterwards
+        for metric in metrics._registry:
+            self.enterContext(mock.patch.object(metric, "_values", {}))
+
+    def scrape(self, **headers):
+        response = self.client.get("/metrics", **headers)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return response.content.decode().splitlines()
+
+    def test_text_format(self):
+        metrics.REQUEST_SECONDS.observe(0.03, view='say "hi"', method="GET", status=200)
+        metrics.REQUEST_SECONDS.observe(20, view='say "hi"', method="GET", status=200)
+        metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="hit")
+        metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="hit")
+        metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="miss")
+        metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="miss")
+        lines = metrics.render().splitlines()
+
+        labels = 'view="say \\"hi\\"",method="GET",status="200"'
+        for line in [
+            "# HELP dcf_http_request_duration_seconds Time to response headers per view.",
+            "# TYPE dcf_http_request_duration_seconds histogram",
+            f'dcf_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 0',
+            f'dcf_http_request_duration_seconds_bucket{{{labels},le="0.05"}} 1',
+            f'dcf_http_request_duration_seconds_bucket{{{labels},le="10"}} 1',
+            f'dcf_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f"dcf_http_request_duration_seconds_sum{{{labels}}} 20.03",
+            f"dcf_http_request_duration_seconds_count{{{labels}}} 2",
+            "# TYPE dcf_cache_lookups_total counter",
+            'dcf_cache_lookups_total{cache="dashboard",result="hit"} 2',
+            "# TYPE dcf_cache_hit_ratio gauge",
+            'dcf_cache_hit_ratio{cache="dashboard"} 0.5',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_requests_are_recorded(self):
+        self.client.get("/")
+        lines = self.scrape()
+        self.assertIn('dcf_http_request_duration_seconds_count{view="home",method="GET",status="200"} 1', lines)
+        self.assertIn('dcf_http_request_db_queries_count{view="home"} 1', lines)
+        self.assertTrue(any(line.startswith('dcf_http_request_db_seconds_total{view="home"} ') for line in lines))
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertIn("# TYPE dcf_gemini_failures_total counter", self.scrape(HTTP_AUTHORIZATION="Bearer s3cret"))
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        metrics.CACHE_LOOKUPS.inc(cache="dashboard", result="hit")
+        self.assertEqual(metrics.CACHE_LOOKUPS._values, {})
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with self.assertRaises(MiddlewareNotUsed):
+            middleware.MetricsMiddleware(lambda request: None)
+
+    @override_settings(SLOW_REQUEST_MS=1000, SLOW_REQUEST_SQL_LIMIT=2)
+    def test_slow_request_log(self):
+        user = User.objects.create_user("alice")
+        self.client.force_login(user)
+        # Every clock reading is half a second after the previous one
+        clock = iter(range(1000))
+        self.enterContext(mock.patch.object(middleware, "time", mock.Mock(perf_counter=lambda: next(clock) / 2)))
+
+        with self.assertLogs("tracker.slow_requests", "WARNING") as logs:
+            self.client.get("/badges/")
+        summary, *statements = logs.records[0].getMessage().splitlines()
+        self.assertRegex(summary, r"^Slow request GET /badges/ \(badges\): \d+ ms, (\d+) queries, \d+ ms in the database$")
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(all(re.match(r"^ +500\.0 ms  SELECT ", line) for line in statements))
+
+    @override_settings(SLOW_REQUEST_MS=60000)
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs("tracker.slow_requests"):
+            self.client.get("/")
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        try:
+            call_command("check_query_plans", users=100, days=60, stdout=out)
+        except CommandError as e:
+            self.fail(f"{e}\n{out.getvalue()}")
@@ -10,6 +10,9 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('log/', views.log_activity, name="log_activity"),
     path('reset/', views.reset_dashboard, name='reset_dashboard'),
+    path('import/', views.import_activity, name='import_activity'),
+    path('export/', views.export_activity, name='export_activity'),
+    path('api/activity/', views.activity_history, name='activity_history'),
     
     path('set_dashboard_flag/', views.set_dashboard_flag, name='set_dashboard_flag'),
     
@@ -2,35 +2,35 @@ from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .forms import ActivityLogForm
-from .models import ActivityLog
 from django.utils import timezone
 from datetime import timedelta
 from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+import hashlib
 import json
 from datetime import timedelta, date
-import numpy as np
-from sklearn.linear_model import LinearRegression
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponse, Http404
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from .gemini_chatbot import ask_gemini
+from . import gemini_chatbot
+from django.contrib.admin.views.decorators import staff_member_required
 
 
-from .models import UserProfile, Badge, UserBadge, ActivityLog
-from django.db.models import Sum
-from django.db.models import Sum, F, FloatField, ExpressionWrapper,Count
-
-CO2_EMAIL = 0.004      # 4 g per email
-CO2_DRIVE = 1.1        # 1.1 kg per GB/month
-CO2_COMMIT = 0.0005    # 0.5 g per commit
-
-DAILY_CO2_GOAL = 1.0   # Daily CO₂ goal in kg
+from .models import UserProfile, UserBadge, DAILY_CO2_GOAL
+from . import leaderboard as leaderboard_engine
+from . import queries, activity, dashboard_cache, ingest, export, metrics, history, snapshot, conversation
+from .forecast import linear_forecast
+from .db_router import primary_reads, replica_reads
 
 def home(request):
     return render(request, 'home.html')
 
 
+@replica_reads
 @login_required(login_url='login')
 @never_cache
 def dashboard(request):
@@ -39,52 +39,52 @@ def dashboard(request):
 
     today = timezone.now().date()
     period = request.GET.get("period", "week")
+    start_date = queries.period_start(period, today)
+
+    # Computed numbers are cached per user/period/day and dropped on any
+    # ActivityLog change; the browser still gets never_cache headers. They
+    # are computed on the primary so a lagging replica never gets cached.
+    period_key = period if start_date else "all"
+    stats = dashboard_cache.get(request.user.id, period_key, today)
+    if stats is None:
+        with primary_reads():
+            stats = _dashboard_stats(request.user, start_date, today)
+        dashboard_cache.set(request.user.id, period_key, today, stats)
+
+    # Rank comes from the shared per-user snapshot (short TTL, since it
+    # depends on everyone's totals)
+    context = snapshot.get(request.user.id, today)
+    user_rank = context.rank
+    if not context.has_profile:
+        user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        user_rank = leaderboard_engine.rank_of(user_profile)
 
-    if period == "week":
-        start_date = today - timedelta(days=7)
-    elif period == "month":
-        start_date = today - timedelta(days=30)
-    else:
-        start_date = None
+    return render(request, "tracker/dashboard.html", {
+        **stats,
+        "period": period,
+        "daily_goal": DAILY_CO2_GOAL,
+        "user_rank": user_rank,
+    })
 
-    if start_date:
-        logs_period = ActivityLog.objects.filter(user=request.user, date__gte=start_date).order_by("date")
-    else:
-        logs_period = ActivityLog.objects.filter(user=request.user).order_by("date")
 
-    total_co2 = sum(
-        log.emails_sent * CO2_EMAIL +
-        log.drive_storage_gb * CO2_DRIVE +
-        log.github_commits * CO2_COMMIT
-        for log in logs_period
-    )
-    total_emails = sum(log.emails_sent for log in logs_period)
-    total_drive = sum(log.drive_storage_gb for log in logs_period)
-    total_commits = sum(log.github_commits for log in logs_period)
+def _dashboard_stats(user, start_date, today):
+    # Totals and the per-day series are aggregated by the database
+    totals = queries.period_totals(user, start_date)
+    total_co2 = totals["total_co2"]
+    total_emails = totals["total_emails"]
+    total_drive = totals["total_drive"]
+    total_commits = totals["total_commits"]
 
     # Chart data
-    chart_labels = []
-    chart_data = []
-    cumulative_co2 = 0
-    for log in logs_period:
-        daily_co2 = (
-            log.emails_sent * CO2_EMAIL +
-            log.drive_storage_gb * CO2_DRIVE +
-            log.github_commits * CO2_COMMIT
-        )
-        cumulative_co2 += daily_co2
-        chart_labels.append(log.date.strftime("%Y-%m-%d"))
-        chart_data.append(round(cumulative_co2, 2))
-
-    # Prediction (Linear Regression)
-    prediction = None
-    if len(chart_data) >= 3:
-        X = np.arange(len(chart_data)).reshape(-1, 1)
-        y = np.array(chart_data)
-        model = LinearRegression()
-        model.fit(X, y)
-        next_index = len(chart_data) + 7
-        prediction = round(float(model.predict([[next_index]])[0]), 2)
+    daily_series = queries.daily_co2_series(user, start_date)
+    chart_labels, chart_data = queries.cumulative(daily_series)
+
+    # Prediction (closed-form linear trend, 7 steps ahead)
+    prediction = prediction_range = None
+    forecast = linear_forecast(chart_data)
+    if forecast:
+        prediction = round(forecast.value, 2)
+        prediction_range = (round(max(forecast.lower, 0), 2), round(forecast.upper, 2))
 
     # Suggestions
     suggestions = []
@@ -97,40 +97,23 @@ def dashboard(request):
     if not suggestions:
         suggestions.append("✅ Great job! Your digital carbon footprint is under control.")
 
-    # Daily CO₂
-    daily_logs = ActivityLog.objects.filter(user=request.user, date=today)
-    daily_co2 = sum(
-        log.emails_sent * CO2_EMAIL +
-        log.drive_storage_gb * CO2_DRIVE +
-        log.github_commits * CO2_COMMIT
-        for log in daily_logs
-    )
+    # Daily CO₂ (today always falls inside the selected period)
+    daily_co2 = dict(daily_series).get(today) or 0.0
     daily_progress = min(int((daily_co2 / DAILY_CO2_GOAL) * 100), 100)
 
-    # User rank
-    all_profiles = list(UserProfile.objects.order_by("total_co2"))
-    user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
-    if user_profile in all_profiles:
-        user_rank = all_profiles.index(user_profile) + 1
-    else:
-        user_rank = None
-
-    return render(request, "tracker/dashboard.html", {
-        "logs": logs_period,
+    return {
         "total_co2": round(total_co2, 2),
         "total_emails": total_emails,
         "total_drive": total_drive,
         "total_commits": total_commits,
         "chart_labels": chart_labels,
         "chart_data": chart_data,
-        "period": period,
         "prediction": prediction,
+        "prediction_range": prediction_range,
         "suggestions": suggestions,
         "daily_co2": round(daily_co2, 2),
         "daily_progress": daily_progress,
-        "daily_goal": DAILY_CO2_GOAL,
-        "user_rank": user_rank,
-    })
+    }
 
 
 
@@ -140,27 +123,9 @@ def log_activity(request):
     if request.method == "POST":
         form = ActivityLogForm(request.POST)
         if form.is_valid():
-            log = form.save(commit=False)
-            log.user = request.user
-            log.date = date.today()
-            log.save()
-
-            # --- Update total CO₂ for leaderboard ---
-            agg = ActivityLog.objects.filter(user=request.user).aggregate(
-                total_co2=Sum(
-                    ExpressionWrapper(
-                        F("emails_sent") * CO2_EMAIL +
-                        F("drive_storage_gb") * CO2_DRIVE +
-                        F("github_commits") * CO2_COMMIT,
-                        output_field=FloatField()
-                    )
-                )
-            )
-            total = agg["total_co2"] or 0.0
-            profile, _ = UserProfile.objects.get_or_create(user=request.user)
-            profile.total_co2 = total
-            profile.save()
-            # ------------------------------------------------
+            # Adds to today's row if there is one; the aggregates are
+            # updated by the ActivityLog signals
+            activity.record_day(request.user.id, date.today(), **form.cleaned_data)
 
             messages.success(request, "Activity logged successfully!")
             return redirect("dashboard")
@@ -171,90 +136,170 @@ def log_activity(request):
 
 
 # LEADERBOARD VIEW
+@replica_reads
 def leaderboard(request):
-    # Update each user's total CO₂
-    for profile in UserProfile.objects.all():
-        agg = ActivityLog.objects.filter(user=profile.user).aggregate(
-            total_co2=Sum(
-                ExpressionWrapper(
-                    F("emails_sent") * 0.004 +
-                    F("drive_storage_gb") * 1.1 +
-                    F("github_commits") * 0.0005,
-                    output_field=FloatField()
-                )
-            ),
-            log_count=Count("id"),
-        )
-
-        total = agg["total_co2"] or 0.0
-        logs = agg["log_count"] or 0
-
-        profile.total_co2 = total
-        profile.save()
-
-    # Hybrid ranking: reward more logs, penalize high emissions
-    ranked_users = []
-    for profile in UserProfile.objects.all():
-        logs = ActivityLog.objects.filter(user=profile.user).count()
-        total_co2 = profile.total_co2
-        score = (logs * 10) - total_co2
-        ranked_users.append({
+    # Totals and hybrid score are maintained on every ActivityLog write,
+    # so this is a fixed number of queries regardless of the number of users.
+    top = list(leaderboard_engine.top_profiles())
+    projected = leaderboard_engine.projections(top)
+    ranked_users = [
+        {
             "user": profile.user,
-            "log_count": logs,
-            "total_co2": total_co2,
-            "score": round(score, 2),
-        })
-
-    # Sort users by score (high to low)
-    ranked_users = sorted(ranked_users, key=lambda x: x["score"], reverse=True)[:10]
+            "log_count": profile.log_count,
+            "total_co2": profile.total_co2,
+            "score": round(profile.score, 2),
+            "projected_co2": projected.get(profile.user_id),
+        }
+        for profile in top
+    ]
 
     return render(request, "tracker/leaderboard.html", {"top_users": ranked_users})
 
 def reset_dashboard(request):
     if request.user.is_authenticated:
-        ActivityLog.objects.filter(user=request.user).delete()
+        activity.reset_history(request.user)
     return redirect('dashboard')
 
 
+@staff_member_required
+def import_activity(request):
+    """Bulk upload (POST `file`, CSV/JSON/NDJSON) of historical activity."""
+    if request.method != "POST" or "file" not in request.FILES:
+        return JsonResponse({"error": "POST a CSV or JSON file as 'file'."}, status=400)
+
+    upload = request.FILES["file"]
+    fmt = request.POST.get("format") or ingest.guess_format(upload.name)
+    try:
+        batch_size = int(request.POST.get("batch_size") or ingest.DEFAULT_BATCH_SIZE)
+    except ValueError:
+        batch_size = 0
+    if batch_size < 1:
+        return JsonResponse({"error": "batch_size must be a positive integer."}, status=400)
+    try:
+        result = ingest.import_rows(ingest.read_rows(upload, fmt), batch_size)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(result.as_dict())
+
+
+@login_required(login_url='login')
+def export_activity(request):
+    """
+    Streams the user's activity history as CSV (default) or NDJSON.
+    Staff can pass ?scope=all to export every user's logs (in id order).
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return JsonResponse({"error": "format must be csv or ndjson"}, status=400)
+
+    if request.GET.get("scope") == "all":
+        if not request.user.is_staff:
+            return JsonResponse({"error": "Only staff can export all users."}, status=403)
+        logs = export.queryset_for()
+        filename = f"activity-all.{fmt}"
+    else:
+        logs = export.queryset_for(request.user)
+        filename = f"activity-{request.user.username}.{fmt}"
+
+    response = StreamingHttpResponse(export.stream(logs, fmt), content_type=export.FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _history_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    # The data stamp changes on every write to the user's logs; the date
+    # covers "week"/"month" windows moving on at midnight
+    tag = f"{dashboard_cache.version(request.user.id)}|{timezone.now().date()}|{request.GET.urlencode()}"
+    return hashlib.sha1(tag.encode()).hexdigest()
+
+
+@login_required(login_url='login')
+@condition(etag_func=_history_etag)
+def activity_history(request):
+    """
+    JSON page of the user's logs, newest first. Query params: period
+    (week/month/all), limit, after (cursor from the previous page's
+    "next") and fields (comma-separated subset of history.FIELDS).
+    """
+    try:
+        fields = history.parse_fields(request.GET.get("fields"))
+        limit = history.parse_limit(request.GET.get("limit"))
+        after = history.decode_cursor(request.GET["after"]) if request.GET.get("after") else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    start_date = queries.period_start(request.GET.get("period", "all"), timezone.now().date())
+    logs = queries.user_logs(request.user, start_date)
+    response = JsonResponse(history.page(logs, after=after, limit=limit, fields=fields))
+    # Browsers must revalidate, which If-None-Match makes cheap
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @login_required
 def set_dashboard_flag(request):
     request.session['can_visit_dashboard'] = True
     return redirect('dashboard')
 
 
+@replica_reads
 @csrf_exempt
 def chatbot(request):
     if request.method == "POST":
         data = json.loads(request.body)
         user_message = data.get("message", "").strip()
-        reply = ask_gemini(request.user, user_message)
+
+        # Earlier turns of this session's chat, within a fixed budget
+        memory = conversation.for_request(request)
+
+        # Clients that accept server-sent events get tokens as they arrive
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            return _stream_reply(request.user, user_message, memory)
+
+        reply = ask_gemini(request.user, user_message, memory)
 
         return JsonResponse({"reply": reply})
 
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 
-# Badges view
-@login_required
-def badges(request):
+def _stream_reply(user, user_message, memory):
+    def events():
+        for piece in gemini_chatbot.stream_gemini(user, user_message, memory):
+            yield f"data: {json.dumps({'delta': piece})}\n\n"
+        yield "event: done\ndata: {}\n\n"
 
-    # Ensure the badge exists (get_or_create ensures no duplicates)
-    first_log_badge, _ = Badge.objects.get_or_create(
-        name="First Activity Logged",
-        defaults={
-            "description": "Logged your first activity!",
-            "icon": "🎉"
-        }
-    )
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # don't let proxies buffer the stream
+    return response
 
-    # Count how many logs the user has
-    user_logs = ActivityLog.objects.filter(user=request.user).count()
 
-    # Award badge if user qualifies and doesn’t already have it
-    if user_logs >= 1:
-        UserBadge.objects.get_or_create(user=request.user, badge=first_log_badge)
+@staff_member_required
+def chatbot_stats(request):
+    return JsonResponse(gemini_chatbot.cache_stats())
 
-    # Retrieve all badges this user has
-    user_badges = UserBadge.objects.filter(user=request.user).select_related('badge')
 
+# Prometheus scrape endpoint
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# Badges view
+@replica_reads
+@login_required
+def badges(request):
+    # Awards are written by tracker.badges when activity is logged
+    user_badges = (
+        UserBadge.objects.filter(user=request.user)
+        .select_related("badge")
+        .order_by("awarded_on")
+    )
     return render(request, "tracker/badges.html", {"user_badges": user_badges})
@@ -0,0 +1,103 @@
+"""
+One-time password store for the forgot-password flow.
+
+State lives in Django's cache (the OTP_CACHE_ALIAS cache, "state" unless
+configured), so every gunicorn worker sees the same codes as long as that
+cache is shared (file or DB backend, not locmem). Entries expire after
+OTP_TTL seconds and a code is burnt after OTP_MAX_ATTEMPTS wrong guesses,
+so memory stays bounded and codes can't be brute-forced. The code entry
+carries its absolute expiry, and the attempts counter is always written with
+the time remaining on it, so a wrong guess never stretches or shortens the
+code's lifetime. The counter uses the backend's atomic incr() where it has
+one (locmem, Redis, memcached); the file and DB backends implement incr() as
+a get plus a set under the cache's default timeout, so there it is a plain
+read-and-write, and concurrent guesses from several workers can each count
+once (a few extra guesses at most, never an unbounded number). A correct code is
+burnt too: the store only answers whether a guess was right, and the views
+record that in the session that made the guess (see users.views), so no
+other session can ride on it.
+
+The backend is pluggable: OTP_STORE_BACKEND names the class get_store()
+builds (CacheOTPStore by default).
+"""
+import hashlib
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.module_loading import import_string
+
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"          # no code issued, or it timed out
+LOCKED = "locked"            # too many wrong guesses; a new code is needed
+
+# Backends whose incr() is atomic and leaves the key's expiry alone
+ATOMIC_INCR_BACKENDS = (LocMemCache, BaseMemcachedCache, RedisCache)
+
+
+class CacheOTPStore:
+    def __init__(self, alias=None, ttl=None, max_attempts=None):
+        self.cache = caches[alias or settings.OTP_CACHE_ALIAS]
+        self.ttl = ttl or settings.OTP_TTL
+        self.max_attempts = max_attempts or settings.OTP_MAX_ATTEMPTS
+
+    def _key(self, username, part):
+        # Usernames may hold characters some cache backends reject in keys
+        digest = hashlib.sha256(username.encode()).hexdigest()
+        return f"otp:{digest}:{part}"
+
+    def _digest(self, username, code):
+        return salted_hmac("users.otp", f"{username}:{code}").hexdigest()
+
+    def issue(self, username):
+        """Creates a fresh 6-digit code for `username` (replacing any earlier one) and returns it."""
+        code = f"{secrets.randbelow(900000) + 100000}"
+        self.cache.set_many({
+            self._key(username, "code"): (self._digest(username, code), time.time() + self.ttl),
+            self._key(username, "attempts"): 0,
+        }, self.ttl)
+        return code
+
+    def _count_attempt(self, username, remaining):
+        key = self._key(username, "attempts")
+        if isinstance(self.cache, ATOMIC_INCR_BACKENDS):
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # The counter was evicted; start it again
+                pass
+        attempts = (self.cache.get(key) or 0) + 1
+        self.cache.set(key, attempts, remaining)
+        return attempts
+
+    def verify(self, username, code):
+        """Checks a guess. Returns VALID, INVALID, EXPIRED or LOCKED."""
+        entry = self.cache.get(self._key(username, "code"))
+        if entry is None:
+            return EXPIRED
+        expected, expires = entry
+        remaining = expires - time.time()
+        if remaining <= 0:
+            self.clear(username)
+            return EXPIRED
+        attempts = self._count_attempt(username, remaining)
+        if attempts > self.max_attempts:
+            self.clear(username)
+            return LOCKED
+        if not constant_time_compare(expected, self._digest(username, str(code or "").strip())):
+            return INVALID
+        self.clear(username)
+        return VALID
+
+    def clear(self, username):
+        self.cache.delete_many([self._key(username, part) for part in ("code", "attempts")])
+
+
+def get_store():
+    return import_string(settings.OTP_STORE_BACKEND)()
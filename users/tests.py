@@ -1,3 +1,138 @@
-from django.test import TestCase
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import otp
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3, OTP_TTL=600)
+class OTPStoreTests(TestCase):
+    def setUp(self):
+        caches["state"].clear()
+        self.store = otp.CacheOTPStore()
+
+    def test_valid_code_is_burnt(self):
+        code = self.store.issue("alice")
+        self.assertEqual(self.store.verify("alice", code), otp.VALID)
+        self.assertEqual(self.store.verify("alice", code), otp.EXPIRED)
+
+    def test_codes_are_per_user(self):
+        code = self.store.issue("alice")
+        self.store.issue("bob")
+        self.assertEqual(self.store.verify("bob", code), otp.INVALID)
+        self.assertEqual(self.store.verify("alice", code), otp.VALID)
+
+    def test_wrong_guesses_lock_the_code(self):
+        code = self.store.issue("alice")
+        for _ in range(3):
+            self.assertEqual(self.store.verify("alice", "000000"), otp.INVALID)
+        self.assertEqual(self.store.verify("alice", code), otp.LOCKED)
+        self.assertEqual(self.store.verify("alice", code), otp.EXPIRED)
+
+    def test_new_code_resets_attempts(self):
+        self.store.issue("alice")
+        for _ in range(3):
+            self.store.verify("alice", "000000")
+        code = self.store.issue("alice")
+        self.assertEqual(self.store.verify("alice", code), otp.VALID)
+
+    def test_code_expires(self):
+        code = self.store.issue("alice")
+        with mock.patch("time.time", return_value=time.time() + 601):
+            self.assertEqual(self.store.verify("alice", code), otp.EXPIRED)
+
+    def test_code_is_kept_apart_from_recomputable_entries(self):
+        code = self.store.issue("alice")
+        cache.clear()
+        self.assertEqual(self.store.verify("alice", code), otp.VALID)
+
+    def test_no_code_issued(self):
+        self.assertEqual(self.store.verify("alice", "123456"), otp.EXPIRED)
+
+
+class FileBackendOTPStoreTests(TestCase):
+    """The file backend's incr() is a get plus a set under its own TIMEOUT."""
+
+    def setUp(self):
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "otp": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+                "TIMEOUT": 2,
+            },
+        }))
+        self.store = otp.CacheOTPStore(alias="otp", ttl=600, max_attempts=3)
+
+    def test_wrong_guess_keeps_code_lifetime(self):
+        code = self.store.issue("alice")
+        self.assertEqual(self.store.verify("alice", "000000"), otp.INVALID)
+        with mock.patch("time.time", return_value=time.time() + 2.5):
+            self.assertEqual(self.store.verify("alice", code), otp.VALID)
+
+    def test_attempts_count_across_default_timeout(self):
+        code = self.store.issue("alice")
+        now = time.time()
+        for i in range(3):
+            with mock.patch("time.time", return_value=now + 3 * i):
+                self.assertEqual(self.store.verify("alice", "000000"), otp.INVALID)
+        with mock.patch("time.time", return_value=now + 9):
+            self.assertEqual(self.store.verify("alice", code), otp.LOCKED)
+
+    def test_code_expires(self):
+        code = self.store.issue("alice")
+        with mock.patch("time.time", return_value=time.time() + 601):
+            self.assertEqual(self.store.verify("alice", code), otp.EXPIRED)
+        self.assertIsNone(caches["otp"].get(self.store._key("alice", "code")))
+
+
+class PasswordResetFlowTests(TestCase):
+    CODE = "223456"
+
+    def setUp(self):
+        caches["state"].clear()
+        self.user = User.objects.create_user("victim", password="old-password")
+
+    def _request_code(self, client):
+        with mock.patch("users.otp.secrets.randbelow", return_value=int(self.CODE) - 100000):
+            client.post(reverse("forgot_password"), {"username": "victim"})
+
+    def _reset(self, client, password):
+        return client.post(reverse("reset_password"), {"password": password, "confirm_password": password})
+
+    def test_reset_after_verifying(self):
+        self._request_code(self.client)
+        self.assertRedirects(self.client.post(reverse("verify_otp"), {"otp": self.CODE}), reverse("reset_password"))
+        self.assertRedirects(self._reset(self.client, "new-password"), reverse("login"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-password"))
+        # The verification is used up
+        self.assertRedirects(self._reset(self.client, "again"), reverse("forgot_password"))
+
+    def test_reset_needs_verification(self):
+        self._request_code(self.client)
+        self.assertRedirects(self._reset(self.client, "new-password"), reverse("forgot_password"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("old-password"))
+
+    def test_other_session_cannot_use_verification(self):
+        attacker = self.client_class()
+        self._request_code(attacker)
+        self._request_code(self.client)
+        self.client.post(reverse("verify_otp"), {"otp": self.CODE})
+
+        self.assertRedirects(self._reset(attacker, "hijacked"), reverse("forgot_password"))
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.check_password("hijacked"))
+
+    def test_verification_expires(self):
+        self._request_code(self.client)
+        self.client.post(reverse("verify_otp"), {"otp": self.CODE})
+        with mock.patch("time.time", return_value=time.time() + 601):
+            self.assertRedirects(self._reset(self.client, "new-password"), reverse("forgot_password"))
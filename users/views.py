@@ -2,9 +2,12 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
-import random
 from django.contrib.auth.hashers import make_password
 from django.core.mail import send_mail
+from django.conf import settings
+import time
+
+from . import otp as otp_store
 
 def signup_view(request):
     if request.method == "POST":
@@ -39,20 +42,20 @@ def logout_view(request):
     return redirect('login')
 
 
-# Temporary storage for OTPs (better: use a model or cache)
-OTP_STORE = {}
+# Set in the session that entered a correct OTP; reset_password requires it
+OTP_VERIFIED_KEY = "reset_otp_verified"
+
 
 def forgot_password(request):
     if request.method == "POST":
         username = request.POST.get("username")
         try:
             user = User.objects.get(username=username)
-            otp = random.randint(100000, 999999)  # 6-digit OTP
-            OTP_STORE[username] = otp
+            otp = otp_store.get_store().issue(user.username)
             # TODO: send otp via email (using Django Email backend)
-            print("DEBUG OTP:", otp)  # remove later, just for testing
             messages.success(request, "OTP has been sent to your registered email.")
             request.session["reset_username"] = username
+            request.session.pop(OTP_VERIFIED_KEY, None)
             return redirect("verify_otp")
         except User.DoesNotExist:
             messages.error(request, "User not found.")
@@ -66,17 +69,25 @@ def verify_otp(request):
 
     if request.method == "POST":
         entered_otp = request.POST.get("otp")
-        if OTP_STORE.get(username) and str(OTP_STORE[username]) == entered_otp:
+        result = otp_store.get_store().verify(username, entered_otp)
+        if result == otp_store.VALID:
+            # Only this session may reset the password, and only once
+            request.session[OTP_VERIFIED_KEY] = {"username": username, "until": time.time() + settings.OTP_TTL}
             messages.success(request, "OTP verified. Please reset your password.")
             return redirect("reset_password")
-        else:
+        elif result == otp_store.INVALID:
             messages.error(request, "Invalid OTP. Try again.")
+        else:
+            # Expired, or too many wrong guesses: start over with a new code
+            messages.error(request, "This OTP is no longer valid. Please request a new one.")
+            return redirect("forgot_password")
     return render(request, "users/verify_otp.html")
 
 
 def reset_password(request):
     username = request.session.get("reset_username")
-    if not username:
+    verified = request.session.get(OTP_VERIFIED_KEY) or {}
+    if not username or verified.get("username") != username or verified.get("until", 0) < time.time():
         return redirect("forgot_password")
 
     if request.method == "POST":
@@ -91,7 +102,7 @@ def reset_password(request):
         user.password = make_password(new_password)  # securely hash password
         user.save()
 
-        OTP_STORE.pop(username, None)  # clear OTP
+        request.session.pop(OTP_VERIFIED_KEY, None)  # the verification can't be reused
         request.session.pop("reset_username", None)
 
         messages.success(request, "Password reset successful! Please login.")